@@ -1,6 +1,17 @@
+import os
+import time
+
+import pandas as pd
 import streamlit as st
 from supabase import create_client, Client
 
+import donnees
+import immeubles
+import invalidation
+import prechauffage
+import profilage
+import resilience
+
 # =========================================================
 # CONFIG STREAMLIT
 # =========================================================
@@ -9,10 +20,30 @@ st.set_page_config(
     layout="wide"
 )
 
+resilience.debut_rerun()
+# écritures faites par d'autres sessions / process depuis le dernier rerun
+invalidation.verifier()
+
 # =========================================================
 # SUPABASE — INITIALISATION DIRECTE
 # =========================================================
+@st.cache_resource
+def creer_client(url, key) -> Client:
+    # un seul client par process, réutilisé par toutes les sessions et reruns
+    return create_client(url, key)
+
+
+@st.cache_resource
+def creer_backend_local():
+    import backend_local
+    return backend_local.partage()
+
+
 def get_supabase() -> Client:
+    # substitut en mémoire (tests de charge, développement hors ligne)
+    if os.environ.get("IMMEUBLE_BACKEND") == "local":
+        return creer_backend_local()
+
     try:
         url = st.secrets["supabase_url"]
         key = st.secrets["supabase_anon_key"]
@@ -20,17 +51,37 @@ def get_supabase() -> Client:
         st.error(f"❌ Clé Supabase manquante : {e}")
         st.stop()
 
-    return create_client(url, key)
+    return creer_client(url, key)
 
 
 supabase = get_supabase()
 st.success("✅ Supabase connecté correctement")
 
+# déjà lancé par serveur.py, sinon démarré ici au premier rerun du process
+prechauffage.demarrer(supabase)
+
 # =========================================================
 # FILTRES GLOBAUX
 # =========================================================
 st.sidebar.title("🔎 Filtres globaux")
 
+# toutes les pages travaillent sur un client restreint à l'immeuble sélectionné
+try:
+    df_immeubles = donnees.charger_immeubles(supabase)
+except Exception as e:
+    df_immeubles = pd.DataFrame()
+    st.sidebar.warning(f"Immeubles indisponibles, données non restreintes : {e}")
+
+if not df_immeubles.empty:
+    noms_immeubles = dict(zip(df_immeubles["id"], df_immeubles["nom"]))
+    immeuble = st.sidebar.selectbox(
+        "Immeuble",
+        list(noms_immeubles),
+        format_func=lambda i: noms_immeubles[i],
+        key="filtre_immeuble"
+    )
+    supabase = immeubles.pour_immeuble(supabase, immeuble)
+
 annee = st.sidebar.selectbox(
     "Année",
     [2023, 2024, 2025],
@@ -49,11 +100,21 @@ page = st.sidebar.radio(
         "📄 Dépenses",
         "💰 Budget",
         "📊 Budget vs Réel",
+        "🏠 Charges par lot",
+        "📈 Comparaison",
         "📘 Plan comptable",
+        "🩺 Diagnostics",
     ],
     key="navigation_principale"
 )
 
+# case proposée seulement si IMMEUBLE_PROFIL le permet (cf. profilage)
+profilage_actif = profilage.DISPONIBLE and st.sidebar.checkbox(
+    "Profiler les pages",
+    value=profilage.ACTIF_PAR_DEFAUT,
+    key="profilage_actif"
+)
+
 # =========================================================
 # IMPORT SÉCURISÉ DES MODULES
 # =========================================================
@@ -67,25 +128,73 @@ def safe_import(module_name, func_name):
         return None
 
 
+def lancer(ui, *args):
+    page = ui.__module__
+    try:
+        with profilage.profiler(page, profilage_actif):
+            ui(*args)
+    except resilience.EcritureIncertaine as e:
+        st.error(
+            "⚠️ L'enregistrement n'a pas pu être confirmé : il a peut-être été appliqué. "
+            "Vérifier les données (rechargées) avant de réessayer."
+        )
+        st.caption(str(e))
+    except resilience.BackendIndisponible as e:
+        st.error("❌ Base de données indisponible, réessayer dans quelques instants.")
+        st.caption(str(e))
+
+    if profilage_actif and page in profilage.derniers:
+        profil = profilage.derniers[page]
+        with st.expander(f"🔥 Profil du rendu – {profil['duree'] * 1000:,.0f} ms"):
+            st.dataframe(profil["points_chauds"], use_container_width=True, hide_index=True)
+            st.caption(f"Profil complet : {profil['fichier']} (pstats / snakeviz)")
+
+
 # =========================================================
 # ROUTAGE
 # =========================================================
 if page == "📄 Dépenses":
     ui = safe_import("depenses_ui", "depenses_ui")
     if ui:
-        ui(supabase, annee)
+        lancer(ui, supabase, annee)
 
 elif page == "💰 Budget":
     ui = safe_import("budget_ui", "budget_ui")
     if ui:
-        ui(supabase, annee)
+        lancer(ui, supabase, annee)
 
 elif page == "📊 Budget vs Réel":
     ui = safe_import("budget_vs_reel_ui", "budget_vs_reel_ui")
     if ui:
-        ui(supabase, annee)
+        lancer(ui, supabase, annee)
+
+elif page == "🏠 Charges par lot":
+    ui = safe_import("charges_par_lot_ui", "charges_par_lot_ui")
+    if ui:
+        lancer(ui, supabase, annee)
+
+elif page == "📈 Comparaison":
+    ui = safe_import("comparaison_ui", "comparaison_ui")
+    if ui:
+        lancer(ui, supabase, annee)
 
 elif page == "📘 Plan comptable":
     ui = safe_import("plan_comptable_ui", "plan_comptable_ui")
     if ui:
-        ui(supabase)
\ No newline at end of file
+        lancer(ui, supabase, annee)
+
+elif page == "🩺 Diagnostics":
+    ui = safe_import("diagnostics_ui", "diagnostics_ui")
+    if ui:
+        lancer(ui)
+
+# =========================================================
+# BADGE « DONNÉES PÉRIMÉES »
+# =========================================================
+perimees = resilience.perimees_du_rerun()
+if perimees:
+    plus_ancienne = min(perimees.values())
+    st.sidebar.warning(
+        f"⏳ Données périmées (backend dégradé) – "
+        f"dernier chargement réussi il y a {(time.time() - plus_ancienne) / 60:.0f} min"
+    )
@@ -0,0 +1,254 @@
+"""
+Backend local en mémoire, substitut de Supabase pour les tests de charge
+et le développement hors ligne (IMMEUBLE_BACKEND=local).
+
+Implémente le sous-ensemble du client utilisé par l'application :
+table().select().eq().in_().order().range(), insert(), update(), delete(), execute().
+Les données sont amorcées depuis data/*.csv et dupliquées sur plusieurs années
+et sur IMMEUBLE_NB_IMMEUBLES immeubles.
+"""
+import itertools
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from rapports import groupe_compte
+
+DOSSIER_DATA = Path(__file__).parent / "data"
+ANNEES = [2023, 2024, 2025]
+LOTS = list(range(1, 21))
+LATENCE_MS = float(os.environ.get("IMMEUBLE_LATENCE_LOCALE_MS", "0"))
+NB_IMMEUBLES = int(os.environ.get("IMMEUBLE_NB_IMMEUBLES", "2"))
+
+
+class Reponse:
+    def __init__(self, data):
+        self.data = data
+
+
+# =========================================================
+# REQUÊTES
+# =========================================================
+class Requete:
+    def __init__(self, backend, table):
+        self.backend = backend
+        self.table = table
+        self.operation = "select"
+        self.colonnes = None
+        self.valeurs = None
+        self.filtres = []
+        self.tris = []
+        self.plage = None
+
+    def select(self, colonnes="*"):
+        colonnes = [c.strip() for c in colonnes.replace("\n", " ").split(",")]
+        self.colonnes = None if colonnes == ["*"] else colonnes
+        return self
+
+    def eq(self, colonne, valeur):
+        self.filtres.append(lambda ligne: ligne.get(colonne) == valeur)
+        return self
+
+    def in_(self, colonne, valeurs):
+        valeurs = set(valeurs)
+        self.filtres.append(lambda ligne: ligne.get(colonne) in valeurs)
+        return self
+
+    def order(self, colonne, desc=False):
+        self.tris.append((colonne, desc))
+        return self
+
+    def range(self, debut, fin):
+        self.plage = (debut, fin)
+        return self
+
+    def insert(self, valeurs):
+        self.operation, self.valeurs = "insert", valeurs
+        return self
+
+    def update(self, valeurs):
+        self.operation, self.valeurs = "update", valeurs
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def execute(self):
+        if self.backend.latence_ms:
+            time.sleep(self.backend.latence_ms / 1000)
+        return Reponse(self.backend.executer(self))
+
+
+# =========================================================
+# BACKEND
+# =========================================================
+class BackendLocal:
+    def __init__(self, latence_ms=LATENCE_MS, nb_immeubles=NB_IMMEUBLES):
+        self.latence_ms = latence_ms
+        self.nb_immeubles = nb_immeubles
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.tables = self._amorcer()
+
+    def table(self, nom):
+        return Requete(self, nom)
+
+    # ---------- Amorçage
+    @staticmethod
+    def _valeur(v):
+        if isinstance(v, float) and pd.isna(v):
+            return None
+        return v.item() if hasattr(v, "item") else v
+
+    def _lignes(self, df):
+        return [
+            {k: self._valeur(v) for k, v in ligne.items()}
+            for ligne in df.to_dict("records")
+        ]
+
+    def _amorcer(self):
+        dep = pd.read_csv(DOSSIER_DATA / "base_depenses_immeuble.csv", encoding="utf-8-sig")
+        dep["compte"] = dep["compte"].astype(str)
+        dep["date"] = pd.to_datetime(dep["date"], dayfirst=True, errors="coerce")
+
+        immeubles = [{"id": i, "nom": f"Immeuble {i}"} for i in range(1, self.nb_immeubles + 1)]
+
+        depenses = []
+        for immeuble in immeubles:
+            for decalage, annee in enumerate(sorted(ANNEES, reverse=True)):
+                df = dep.copy()
+                df["annee"] = annee
+                df["date"] = (df["date"] - pd.DateOffset(years=decalage)).dt.strftime("%Y-%m-%d")
+                # montants distincts d'un immeuble à l'autre
+                facteur = (1 - 0.05 * decalage) * (1 + 0.1 * (immeuble["id"] - 1))
+                df["montant_ttc"] = (df["montant_ttc"] * facteur).round(2)
+                for ligne in self._lignes(df):
+                    ligne["depense_id"] = ligne["id"] = next(self._ids)
+                    ligne["immeuble_id"] = immeuble["id"]
+                    ligne["lot_id"] = None
+                    depenses.append(ligne)
+
+        plan = []
+        for compte, poste in dep.groupby("compte")["poste"].first().items():
+            groupe = groupe_compte(compte)
+            plan.append({
+                "compte_8": compte,
+                "libelle": poste,
+                "groupe_compte": groupe,
+                "libelle_groupe": f"Groupe {groupe}",
+                "groupe_charges": int(groupe) % 5 + 1,
+            })
+
+        bud = pd.read_csv(DOSSIER_DATA / "budget_comptes_generaux.csv")
+        budgets = []
+        for immeuble, annee in itertools.product(immeubles, ANNEES + [max(ANNEES) + 1]):
+            for ligne in self._lignes(bud):
+                budgets.append({
+                    "id": next(self._ids),
+                    "immeuble_id": immeuble["id"],
+                    "annee": annee,
+                    "groupe_compte": str(ligne["groupe_compte"]),
+                    "libelle_groupe": f"Groupe {ligne['groupe_compte']}",
+                    "budget": ligne["budget"],
+                })
+
+        # quote-parts en 1 / 10 000, la dernière part absorbe l'arrondi ;
+        # lots numérotés à la suite d'un immeuble à l'autre
+        repartition = []
+        part = 10000 // len(LOTS)
+        for d in depenses:
+            for i, lot in enumerate(LOTS):
+                repartition.append({
+                    "depense_id": d["depense_id"],
+                    "immeuble_id": d["immeuble_id"],
+                    "lot_id": lot + (d["immeuble_id"] - 1) * len(LOTS),
+                    "quote_part": part if i < len(LOTS) - 1 else 10000 - part * (len(LOTS) - 1),
+                })
+
+        return {
+            "immeubles": immeubles,
+            "depenses": depenses,
+            "plan_comptable": plan,
+            "plan_comptable_immeuble": [],
+            "budgets": budgets,
+            "repartition_depenses": repartition,
+        }
+
+    # ---------- Vues
+    def _vue(self):
+        plan = {p["compte_8"]: p for p in self.tables["plan_comptable"]}
+        lignes = []
+        for d in self.tables["depenses"]:
+            p = plan.get(d["compte"], {})
+            lignes.append({
+                **d,
+                "groupe_compte": p.get("groupe_compte", groupe_compte(d["compte"])),
+                "groupe_charges": p.get("groupe_charges"),
+                "libelle_compte": p.get("libelle"),
+            })
+        return lignes
+
+    # ---------- Exécution
+    def executer(self, requete):
+        with self._lock:
+            if requete.table.startswith("v_"):
+                lignes = self._vue()
+            else:
+                lignes = self.tables.setdefault(requete.table, [])
+
+            selection = [l for l in lignes if all(f(l) for f in requete.filtres)]
+
+            if requete.operation == "insert":
+                nouvelles = requete.valeurs if isinstance(requete.valeurs, list) else [requete.valeurs]
+                inserees = []
+                for v in nouvelles:
+                    ligne = {k: str(x) if hasattr(x, "isoformat") else x for k, x in v.items()}
+                    if requete.table == "depenses":
+                        ligne["depense_id"] = ligne["id"] = next(self._ids)
+                    elif requete.table == "budgets":
+                        ligne["id"] = next(self._ids)
+                    lignes.append(ligne)
+                    inserees.append(dict(ligne))
+                return inserees
+
+            if requete.operation == "update":
+                for ligne in selection:
+                    ligne.update({k: str(x) if hasattr(x, "isoformat") else x for k, x in requete.valeurs.items()})
+                return [dict(l) for l in selection]
+
+            if requete.operation == "delete":
+                ids = {id(l) for l in selection}
+                lignes[:] = [l for l in lignes if id(l) not in ids]
+                return [dict(l) for l in selection]
+
+            for colonne, desc in reversed(requete.tris):
+                selection = sorted(
+                    selection,
+                    key=lambda l: (l.get(colonne) is None, l.get(colonne)),
+                    reverse=desc
+                )
+
+            if requete.plage is not None:
+                debut, fin = requete.plage
+                selection = selection[debut:fin + 1]
+
+            if requete.colonnes is None:
+                return [dict(l) for l in selection]
+            return [{c: l.get(c) for c in requete.colonnes} for l in selection]
+
+
+_partage = None
+_lock_partage = threading.Lock()
+
+
+def partage():
+    """Instance unique du process (application et préchauffage lisent les mêmes données)."""
+    global _partage
+    with _lock_partage:
+        if _partage is None:
+            _partage = BackendLocal()
+        return _partage
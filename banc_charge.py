@@ -0,0 +1,235 @@
+"""
+Banc de charge : sessions Streamlit simulées en parallèle contre le backend local.
+
+    python banc_charge.py --sessions 1,5,10,25 --actions 20 --latence-ms 20
+    for n in 1 5 20; do python banc_charge.py --sessions 10 --immeubles $n; done   # coût par immeuble
+
+Chaque session pilote app.py sans navigateur (streamlit.testing AppTest) :
+changement de page (navigation_principale), d'immeuble (filtre_immeuble),
+d'année (filtre_annee) et de filtres.
+Pour chaque palier de sessions : latence des reruns p50 / p95 / p99,
+débit (reruns/s) et mémoire résidente maximale du process.
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+APP = str(Path(__file__).parent / "app.py")
+PAGES = [
+    "📄 Dépenses", "💰 Budget", "📊 Budget vs Réel", "🏠 Charges par lot",
+    "📈 Comparaison", "📘 Plan comptable",
+]
+ANNEES = [2023, 2024, 2025]
+
+
+# =========================================================
+# MÉMOIRE
+# =========================================================
+def rss_octets():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # hors Linux : pic depuis le démarrage (ko sous Linux, octets sous macOS)
+        pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pic if sys.platform == "darwin" else pic * 1024
+
+
+class EchantillonneurMemoire(threading.Thread):
+    def __init__(self, periode=0.05):
+        super().__init__(daemon=True)
+        self.periode = periode
+        self.pic = rss_octets()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.is_set():
+            self.pic = max(self.pic, rss_octets())
+            self._arret.wait(self.periode)
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+        return self.pic
+
+
+# =========================================================
+# SESSION SIMULÉE
+# =========================================================
+def _partager_runtime():
+    """
+    AppTest installe un Runtime factice et l'option global.appTest, tous deux
+    globaux, au début de chaque run et les retire à la fin : avec plusieurs
+    sessions en threads, la fin d'un run ne doit pas les retirer aux runs en cours.
+    Le script est compilé une seule fois, comme par le serveur (ScriptCache partagé).
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    config.set_option("global.appTest", True)
+    cache_script = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: cache_script
+
+    instance_origine = Runtime.instance.__func__
+    dernier = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            dernier["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in dernier:
+            return dernier["runtime"]
+        return instance_origine(cls)
+
+    Runtime.instance = classmethod(instance)
+
+
+def _choix(widget):
+    """
+    Options affichées réutilisables comme valeur : AppTest ne sait régler une valeur
+    que par l'objet d'origine, inconnu ici si format_func n'est pas un simple str.
+    """
+    try:
+        return [o for o in widget.options if str(widget.format_func(o)) == o]
+    except (KeyError, TypeError):
+        return []
+
+
+def _filtre_au_hasard(at, rng):
+    """Modifie un filtre de la page courante ; False si la page n'en a pas."""
+    selectboxes = [s for s in at.main.selectbox if len(_choix(s)) > 1]
+    multiselects = [m for m in at.main.multiselect if _choix(m)]
+
+    if selectboxes and (not multiselects or rng.random() < 0.7):
+        s = rng.choice(selectboxes)
+        s.set_value(rng.choice(_choix(s)))
+        return True
+    if multiselects:
+        m = rng.choice(multiselects)
+        choix = _choix(m)
+        m.set_value(rng.sample(choix, k=min(len(choix), rng.randint(2, 3))))
+        return True
+    return False
+
+
+def session(graine, nb_actions, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(graine)
+    mesures = []
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    debut = time.perf_counter()
+    at.run()
+    mesures.append(("demarrage", time.perf_counter() - debut))
+
+    for _ in range(nb_actions):
+        tirage = rng.random()
+        if tirage < 0.4:
+            action = "page"
+            at.sidebar.radio(key="navigation_principale").set_value(rng.choice(PAGES))
+        elif tirage < 0.5:
+            action = "immeuble"
+            immeubles = at.sidebar.selectbox(key="filtre_immeuble")
+            immeubles.select_index(rng.randrange(len(immeubles.options)))
+        elif tirage < 0.6:
+            action = "annee"
+            at.sidebar.selectbox(key="filtre_annee").set_value(rng.choice(ANNEES))
+        else:
+            action = "filtre"
+            if not _filtre_au_hasard(at, rng):
+                continue
+
+        debut = time.perf_counter()
+        at.run()
+        mesures.append((action, time.perf_counter() - debut))
+
+        if at.exception:
+            raise RuntimeError(f"exception dans l'application : {at.exception[0].value}")
+
+    return mesures
+
+
+# =========================================================
+# PALIERS
+# =========================================================
+def palier(nb_sessions, nb_actions, timeout, graine):
+    memoire = EchantillonneurMemoire()
+    memoire.start()
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=nb_sessions) as pool:
+        resultats = list(pool.map(
+            lambda i: session(graine + i, nb_actions, timeout),
+            range(nb_sessions)
+        ))
+    duree = time.perf_counter() - debut
+    pic = memoire.arreter()
+
+    latences = pd.Series([
+        d for mesures in resultats for action, d in mesures if action != "demarrage"
+    ]) * 1000
+
+    return {
+        "sessions": nb_sessions,
+        "reruns": len(latences),
+        "p50_ms": latences.quantile(0.50),
+        "p95_ms": latences.quantile(0.95),
+        "p99_ms": latences.quantile(0.99),
+        "max_ms": latences.max(),
+        "debit_reruns_s": len(latences) / duree,
+        "rss_pic_mo": pic / 1024 / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge multi-sessions")
+    parser.add_argument("--sessions", default="1,5,10,25",
+                        help="paliers de sessions simultanées, ex. 1,5,10,25")
+    parser.add_argument("--actions", type=int, default=20, help="interactions par session")
+    parser.add_argument("--latence-ms", type=float, default=20.0,
+                        help="latence simulée de chaque appel au backend local")
+    parser.add_argument("--timeout", type=float, default=60.0, help="délai maximal d'un rerun (s)")
+    parser.add_argument("--immeubles", type=int, default=2, help="nombre d'immeubles du backend local")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--sortie", help="fichier .csv ou .json")
+    args = parser.parse_args(argv)
+
+    # avant tout import de l'application
+    os.environ["IMMEUBLE_BACKEND"] = "local"
+    os.environ["IMMEUBLE_LATENCE_LOCALE_MS"] = str(args.latence_ms)
+    os.environ["IMMEUBLE_NB_IMMEUBLES"] = str(args.immeubles)
+    _partager_runtime()
+
+    lignes = []
+    for nb in [int(n) for n in args.sessions.split(",")]:
+        ligne = palier(nb, args.actions, args.timeout, args.graine)
+        lignes.append(ligne)
+        print(
+            f"{nb:>4} session(s) · {ligne['reruns']:>5} reruns · "
+            f"p50 {ligne['p50_ms']:8.1f} ms · p95 {ligne['p95_ms']:8.1f} ms · "
+            f"p99 {ligne['p99_ms']:8.1f} ms · {ligne['debit_reruns_s']:6.1f} reruns/s · "
+            f"RSS pic {ligne['rss_pic_mo']:7.1f} Mo",
+            flush=True
+        )
+
+    rapport = pd.DataFrame(lignes)
+    if args.sortie:
+        if args.sortie.endswith(".json"):
+            rapport.to_json(args.sortie, orient="records", indent=2)
+        else:
+            rapport.to_csv(args.sortie, index=False)
+
+
+if __name__ == "__main__":
+    main()
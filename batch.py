@@ -0,0 +1,198 @@
+"""
+Mode batch : contrôles et rapports sans serveur Streamlit.
+
+    python batch.py --annee 2025
+    python batch.py --annees 2023-2025 --rapports controle,budget_vs_reel --format csv --sortie sorties_batch/
+    python batch.py --annee 2025 --rapports controle --strict    # code retour 1 si anomalies
+    python batch.py --annee 2025 --rapports doublons --strict    # après un import : saisies en double
+    python batch.py --annee 2025 --immeuble 2                    # un seul immeuble (sinon tous)
+
+Les années sont traitées en parallèle ; pour une année donnée, les frames
+(depenses, budgets, vues, répartitions) sont chargés une fois et partagés entre rapports.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import donnees
+import doublons
+import rapports
+from immeubles import pour_immeuble
+
+RAPPORTS = ["controle", "budget_vs_reel", "statistiques", "doublons"]
+
+
+# =========================================================
+# RAPPORTS PAR ANNÉE
+# =========================================================
+def rapport_controle(supabase, annee):
+    df_dep = donnees.charger_depenses(supabase, annee)
+    df_rep = donnees.charger_repartition(supabase)
+    if df_dep.empty or df_rep.empty:
+        return {"kpi": {"nb_anomalies": 0}, "tables": {}}
+
+    controle = rapports.controle_repartition(df_dep[["id", "montant_ttc", "compte"]], df_rep)
+    return {
+        "kpi": controle["kpi"],
+        "tables": {"anomalies": controle["anomalies"], "detail": controle["detail"]},
+    }
+
+
+def rapport_budget_vs_reel(supabase, annee):
+    df_budget = donnees.charger_budgets(supabase, annee)
+    df_dep = donnees.charger_depenses(supabase, annee)
+    if df_budget.empty or df_dep.empty:
+        return {"kpi": {}, "tables": {}}
+
+    # même classement que la page (plan de l'immeuble, surcharges comprises)
+    df_dep = rapports.classer_depenses(df_dep, donnees.charger_plan_comptable(supabase))
+    df = rapports.budget_vs_reel(df_budget, df_dep)
+    return {
+        "kpi": {
+            "budget": float(df["budget"].sum()),
+            "reel": float(df["reel"].sum()),
+            "ecart": float(df["ecart"].sum()),
+        },
+        "tables": {"budget_vs_reel": df.sort_values("groupe_compte")},
+    }
+
+
+def rapport_statistiques(supabase, annee):
+    df_dep = donnees.charger_depenses(supabase, annee)
+    if df_dep.empty:
+        return {"kpi": {}, "tables": {}}
+
+    # groupes du plan de l'immeuble (surcharges comprises), comme le cube de la page
+    df = rapports.classer_depenses(
+        rapports.preparer_depenses(df_dep), donnees.charger_plan_comptable(supabase)
+    )
+    tables = {
+        "par_groupe_compte": rapports.par_groupe_compte(df),
+        "top_fournisseurs": rapports.top_fournisseurs(df),
+    }
+
+    mensuel = rapports.mensuel(df)
+    if mensuel is not None:
+        tables["mensuel"] = mensuel
+
+    df_budget = donnees.charger_budgets(supabase, annee)
+    if not df_budget.empty:
+        tables["budget_vs_reel_groupes"] = rapports.budget_vs_reel_groupes(df_budget, df)
+
+    return {"kpi": rapports.kpi_depenses(df), "tables": tables}
+
+
+def rapport_doublons(supabase, annee):
+    # détection sur toutes les années, calculée une fois et partagée entre années
+    rapport = doublons.get_rapport(supabase, annee)
+    return {
+        "kpi": rapport["kpi"],
+        "tables": {
+            nom: rapport[nom]
+            for nom in ["doublons", "avoirs_orphelins", "sinistres_sans_remboursement"]
+        },
+    }
+
+
+CALCULS = {
+    "controle": rapport_controle,
+    "budget_vs_reel": rapport_budget_vs_reel,
+    "statistiques": rapport_statistiques,
+    "doublons": rapport_doublons,
+}
+
+
+def executer_annee(supabase, annee, noms):
+    return annee, {nom: CALCULS[nom](supabase, annee) for nom in noms}
+
+
+# =========================================================
+# ÉCRITURE
+# =========================================================
+def ecrire(resultats, dossier, fmt):
+    dossier.mkdir(parents=True, exist_ok=True)
+
+    for annee, par_rapport in resultats.items():
+        for nom, rapport in par_rapport.items():
+            if fmt == "json":
+                contenu = {
+                    "annee": annee,
+                    "rapport": nom,
+                    "kpi": rapport["kpi"],
+                    "tables": {
+                        t: json.loads(df.to_json(orient="records", date_format="iso"))
+                        for t, df in rapport["tables"].items()
+                    },
+                }
+                with open(dossier / f"{nom}_{annee}.json", "w", encoding="utf-8") as f:
+                    json.dump(contenu, f, ensure_ascii=False, indent=2)
+            else:
+                pd.DataFrame([{"annee": annee, **rapport["kpi"]}]).to_csv(
+                    dossier / f"{nom}_{annee}_kpi.csv", index=False
+                )
+                for t, df in rapport["tables"].items():
+                    df.to_csv(dossier / f"{nom}_{annee}_{t}.csv", index=False)
+
+
+# =========================================================
+# CLI
+# =========================================================
+def annees_demandees(args):
+    if args.annees:
+        debut, _, fin = args.annees.partition("-")
+        return list(range(int(debut), int(fin or debut) + 1))
+    return [args.annee]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Contrôles et rapports en mode batch")
+    annees = parser.add_mutually_exclusive_group(required=True)
+    annees.add_argument("--annee", type=int)
+    annees.add_argument("--annees", help="plage d'années, ex. 2023-2025")
+    parser.add_argument("--rapports", default=",".join(RAPPORTS),
+                        help=f"liste séparée par des virgules parmi {', '.join(RAPPORTS)}")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--sortie", default="sorties_batch")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--immeuble", type=int, help="identifiant de l'immeuble (sinon tous les immeubles)")
+    parser.add_argument("--strict", action="store_true",
+                        help="code retour 1 si le contrôle de répartition trouve des anomalies "
+                             "ou si des doublons probables sont détectés")
+    args = parser.parse_args(argv)
+
+    noms = [n.strip() for n in args.rapports.split(",") if n.strip()]
+    inconnus = set(noms) - set(RAPPORTS)
+    if inconnus:
+        parser.error(f"rapport(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+
+    from supabase_client import get_supabase_env
+    supabase = get_supabase_env()
+    if args.immeuble is not None:
+        supabase = pour_immeuble(supabase, args.immeuble)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        resultats = dict(pool.map(
+            lambda annee: executer_annee(supabase, annee, noms),
+            annees_demandees(args)
+        ))
+
+    ecrire(resultats, Path(args.sortie), args.format)
+
+    anomalies = 0
+    for annee, par_rapport in sorted(resultats.items()):
+        for nom, rapport in par_rapport.items():
+            print(f"{annee} {nom}: {json.dumps(rapport['kpi'], ensure_ascii=False)}")
+        if "controle" in par_rapport:
+            anomalies += par_rapport["controle"]["kpi"].get("nb_anomalies", 0)
+        if "doublons" in par_rapport:
+            anomalies += par_rapport["doublons"]["kpi"].get("nb_doublons", 0)
+
+    return 1 if args.strict and anomalies else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 
+import donnees
+from immeubles import immeuble_de
+
 
 def budget_ui(supabase, annee):
     st.subheader(f"💰 Budget – {annee}")
@@ -8,18 +11,11 @@ def budget_ui(supabase, annee):
     # =========================
     # Chargement budgets
     # =========================
-    bud = (
-        supabase
-        .table("budgets")
-        .select("id, annee, groupe_compte, libelle_groupe, budget")
-        .eq("annee", annee)
-        .execute()
-    )
+    immeuble = immeuble_de(supabase)
+    df = donnees.charger_budgets(supabase, annee)
 
-    if not bud.data:
+    if df.empty:
         df = pd.DataFrame(columns=["id", "annee", "groupe_compte", "libelle_groupe", "budget"])
-    else:
-        df = pd.DataFrame(bud.data)
 
     # =========================
     # KPI
@@ -51,12 +47,13 @@ def budget_ui(supabase, annee):
             montant = st.number_input("Budget", min_value=0.0, step=100.0)
 
         if st.button("Ajouter", key="budget_add"):
-            supabase.table("budgets").insert({
+            donnees.ecrire(supabase.table("budgets").insert({
                 "annee": annee,
                 "groupe_compte": groupe_compte,
                 "libelle_groupe": libelle_groupe,
                 "budget": montant
-            }).execute()
+            }), "budgets", annee, immeuble)
+            donnees.invalider("budgets", annee, immeuble)
             st.success("Ligne ajoutée")
             st.rerun()
 
@@ -79,14 +76,19 @@ def budget_ui(supabase, annee):
 
             with col1:
                 if st.button("💾 Enregistrer", key=f"bud_save_{row['id']}"):
-                    supabase.table("budgets").update({
+                    donnees.ecrire(supabase.table("budgets").update({
                         "budget": new_budget
-                    }).eq("id", row["id"]).execute()
+                    }).eq("id", row["id"]), "budgets", annee, immeuble)
+                    donnees.invalider("budgets", annee, immeuble)
                     st.success("Budget mis à jour")
                     st.rerun()
 
             with col2:
                 if st.button("🗑️ Supprimer", key=f"bud_del_{row['id']}"):
-                    supabase.table("budgets").delete().eq("id", row["id"]).execute()
+                    donnees.ecrire(
+                        supabase.table("budgets").delete().eq("id", row["id"]),
+                        "budgets", annee, immeuble
+                    )
+                    donnees.invalider("budgets", annee, immeuble)
                     st.warning("Ligne supprimée")
                     st.rerun()
\ No newline at end of file
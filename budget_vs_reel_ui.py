@@ -1,5 +1,8 @@
 import streamlit as st
-import pandas as pd
+
+import cube
+import donnees
+from rapports import budget_vs_reel
 
 
 def budget_vs_reel_ui(supabase, annee):
@@ -8,73 +11,29 @@ def budget_vs_reel_ui(supabase, annee):
     # ======================================================
     # CHARGEMENT BUDGETS (TABLE budgets)
     # ======================================================
-    try:
-        r_budget = (
-            supabase
-            .table("budgets")
-            .select("annee, budget, groupe_compte, libelle_groupe")
-            .eq("annee", annee)
-            .execute()
-        )
-    except Exception as e:
-        st.error("❌ Erreur chargement budgets")
-        st.exception(e)
-        return
+    df_budget = donnees.charger_budgets(supabase, annee)
 
-    if not r_budget.data:
+    if df_budget.empty:
         st.warning("Aucun budget trouvé")
         return
 
-    df_budget = pd.DataFrame(r_budget.data)
-
     # ======================================================
-    # CHARGEMENT RÉEL (VUE v_depenses_enrichies)
+    # RÉEL PAR GROUPE DE COMPTE (CUBE DE L'ANNÉE)
     # ======================================================
-    try:
-        r_dep = (
-            supabase
-            .table("v_depenses_enrichies")
-            .select("annee, montant_ttc, groupe_charges, groupe_compte")
-            .eq("annee", annee)
-            .execute()
-        )
-    except Exception as e:
-        st.error("❌ Erreur chargement dépenses")
-        st.exception(e)
-        return
+    df_dep = (
+        cube.get_cube(supabase, annee)
+        .agreger("groupe_compte")
+        .rename(columns={"total": "montant_ttc"})
+    )
 
-    if not r_dep.data:
+    if df_dep.empty:
         st.warning("Aucune dépense trouvée")
         return
 
-    df_dep = pd.DataFrame(r_dep.data)
-
-    # ======================================================
-    # AGRÉGATIONS
-    # ======================================================
-    df_budget_grp = (
-        df_budget
-        .groupby(["groupe_compte", "libelle_groupe"], as_index=False)
-        .agg(budget=("budget", "sum"))
-    )
-
-    df_reel_grp = (
-        df_dep
-        .groupby("groupe_compte", as_index=False)
-        .agg(reel=("montant_ttc", "sum"))
-    )
-
     # ======================================================
-    # MERGE
+    # AGRÉGATIONS + MERGE
     # ======================================================
-    df = df_budget_grp.merge(
-        df_reel_grp,
-        on="groupe_compte",
-        how="left"
-    )
-
-    df["reel"] = df["reel"].fillna(0)
-    df["ecart"] = df["budget"] - df["reel"]
+    df = budget_vs_reel(df_budget, df_dep)
 
     # ======================================================
     # FILTRE GROUPE DE CHARGES (LOGIQUE)
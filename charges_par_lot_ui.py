@@ -1,5 +1,106 @@
+import time
+
 import streamlit as st
 
-def charges_par_lot_ui():
-    st.header("💰 Charges par lot")
-    st.success("Module Charges par lot chargé correctement")
\ No newline at end of file
+import donnees
+import rapports
+import rendu
+import repartition
+
+VENTILATIONS = {
+    "Total": None,
+    "Par groupe de charges": "groupe_charges",
+    "Par compte": "compte",
+}
+
+
+def charges_par_lot_ui(supabase, annee):
+    st.header(f"💰 Charges par lot – {annee}")
+
+    # =========================
+    # CHARGEMENT
+    # =========================
+    df_dep = donnees.charger_depenses(supabase, annee)
+
+    if df_dep.empty:
+        st.warning("Aucune dépense pour cette année.")
+        return
+
+    # groupes du plan de l'immeuble (surcharges comprises)
+    df_dep = rapports.classer_depenses(df_dep, donnees.charger_plan_comptable(supabase))
+
+    matrice = repartition.get_matrice(supabase)
+
+    if matrice.nb_lots == 0:
+        st.warning("Aucune répartition enregistrée.")
+        return
+
+    df_dep = df_dep.set_index("id")
+    montants = df_dep["montant_ttc"].astype(float)
+
+    # =========================
+    # PRODUITS MATRICE × VECTEUR
+    # =========================
+    ventilation = st.radio(
+        "Ventilation",
+        list(VENTILATIONS),
+        horizontal=True,
+        key="charges_par_lot_ventilation"
+    )
+    par = VENTILATIONS[ventilation]
+
+    debut = time.perf_counter()
+    charges = matrice.charges_par_lot(montants)
+    detail = matrice.charges_par_lot_et(montants, df_dep[par]) if par else None
+    non_reparti = matrice.non_reparti(montants)
+    duree = time.perf_counter() - debut
+
+    # =========================
+    # KPI
+    # =========================
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Dépenses (€)", f"{montants.sum():,.2f}")
+    col2.metric("Réparti (€)", f"{charges.sum():,.2f}")
+    col3.metric("Non réparti (€)", f"{non_reparti.sum():,.2f}")
+    col4.metric("Lots", matrice.nb_lots)
+
+    st.caption(
+        f"Matrice {matrice.nb_depenses:,} dépenses × {matrice.nb_lots} lots "
+        f"({matrice.matrice.nnz:,} quote-parts) · calcul en {duree * 1000:,.1f} ms"
+    )
+
+    if not non_reparti.empty:
+        st.warning(f"{len(non_reparti)} dépense(s) incomplètement répartie(s) sur l'année.")
+
+    # =========================
+    # TABLEAU ET GRAPHIQUE
+    # =========================
+    tableau = charges.rename("total").to_frame()
+    if detail is not None:
+        tableau = detail.join(tableau)
+    tableau = tableau.rename_axis("lot_id").reset_index()
+    tableau["lot_id"] = tableau["lot_id"].astype(str)
+
+    rendu.barres(tableau, "lot_id", "total", "Charges par lot (€)", "charges_par_lot")
+
+    st.dataframe(
+        tableau.style.format({c: "{:,.2f}" for c in tableau.columns if c != "lot_id"}),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # =========================
+    # DÉTAIL D'UN LOT
+    # =========================
+    if detail is not None:
+        lot = st.selectbox("Détail du lot", tableau["lot_id"], key="charges_par_lot_lot")
+        detail_lot = (
+            detail.loc[detail.index.astype(str) == lot]
+            .T
+            .set_axis(["montant"], axis=1)
+            .query("montant != 0")
+            .sort_values("montant", ascending=False)
+            .rename_axis(par)
+            .reset_index()
+        )
+        st.dataframe(detail_lot, use_container_width=True, hide_index=True)
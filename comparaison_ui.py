@@ -0,0 +1,82 @@
+import streamlit as st
+
+import donnees
+import rapports
+import rendu
+
+ANNEES = [2023, 2024, 2025, 2026]
+DIMENSIONS = {
+    "groupe_compte": "Groupe de compte",
+    "compte": "Compte",
+    "fournisseur": "Fournisseur",
+}
+
+
+def comparaison_ui(supabase, annee):
+    st.header("📈 Comparaison pluriannuelle")
+
+    # =========================
+    # SÉLECTION
+    # =========================
+    c1, c2 = st.columns([3, 1])
+
+    annees = c1.multiselect(
+        "Années",
+        ANNEES,
+        default=[a for a in ANNEES if annee - 2 <= a <= annee],
+        key="comparaison_annees"
+    )
+
+    par = c2.selectbox(
+        "Regrouper par",
+        list(DIMENSIONS),
+        format_func=DIMENSIONS.get,
+        key="comparaison_par"
+    )
+
+    if len(annees) < 2:
+        st.info("Sélectionner au moins deux années.")
+        return
+
+    annees = sorted(annees)
+
+    # =========================
+    # CHARGEMENT (UNE REQUÊTE POUR LES ANNÉES NON EN CACHE)
+    # =========================
+    df = donnees.charger_depenses_annees(supabase, annees)
+
+    if df.empty:
+        st.warning("Aucune dépense pour ces années.")
+        return
+
+    # groupes du plan de l'immeuble (surcharges et reclassements compris)
+    df = rapports.classer_depenses(df, donnees.charger_plan_comptable(supabase))
+    pivot = rapports.comparaison_annees(df, annees, par)
+    colonnes_annees = [str(a) for a in annees]
+
+    # =========================
+    # KPI
+    # =========================
+    totaux = pivot[colonnes_annees].sum()
+    cols = st.columns(len(annees))
+    for i, (col, a) in enumerate(zip(cols, colonnes_annees)):
+        delta = None if i == 0 else f"{totaux[a] - totaux[colonnes_annees[i - 1]]:,.2f} €"
+        col.metric(a, f"{totaux[a]:,.2f} €", delta=delta, delta_color="inverse")
+
+    # =========================
+    # GRAPHIQUE + TABLEAU
+    # =========================
+    rendu.barres(
+        pivot,
+        x=par,
+        y=colonnes_annees,
+        titre=f"Dépenses par {DIMENSIONS[par].lower()} et par année",
+        cle="comparaison_barres",
+        stack=False
+    )
+
+    st.dataframe(
+        pivot.sort_values(colonnes_annees[-1], ascending=False),
+        use_container_width=True,
+        hide_index=True
+    )
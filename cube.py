@@ -0,0 +1,331 @@
+"""
+Cube de rollup des dépenses d'une année :
+mois × compte × groupe de compte × groupe de charges × fournisseur × type -> (total, nb).
+
+Construit une fois par année, puis tenu à jour par deltas à chaque insertion,
+modification ou suppression, et par changement de clé des seules cellules
+des comptes reclassés dans le plan comptable ; reconstruit seulement si le
+frame depenses est relu pour une autre raison (TTL, rafraîchissement). Les KPI et récapitulatifs des pages sont des
+regroupements des cellules du cube, jamais un nouveau parcours des dépenses.
+"""
+import threading
+
+import pandas as pd
+
+import donnees
+import resilience
+from frames_store import magasin
+from immeubles import commun, immeuble_de, pour_immeuble
+from rapports import groupe_compte
+
+DIMENSIONS = ["mois", "compte", "groupe_compte", "groupe_charges", "fournisseur", "type"]
+SANS_DATE = 0                   # mois des dépenses sans date exploitable
+
+
+class CubeDepenses:
+    def __init__(self, annee, plan=None):
+        self.annee = annee
+        # compte_8 -> (groupe_compte, groupe_charges)
+        self.plan = plan or {}
+        self.cellules = {}          # clé (DIMENSIONS) -> [total, nb]
+        self.lignes = {}            # depense_id -> (clé, montant), pour les deltas
+        # (charge_le, empreinte) du frame depenses reflété ; None : deltas reçus
+        # depuis, le prochain chargement les contient déjà
+        self.source = None
+        self._frame = None
+        self._lock = threading.Lock()
+
+    # ---------- Construction
+    @staticmethod
+    def plan_depuis(df_plan):
+        if df_plan.empty:
+            return {}
+        df_plan = df_plan.reindex(columns=["compte_8", "groupe_compte", "groupe_charges"])
+        return {
+            str(c): (g if pd.notna(g) else None, gc if pd.notna(gc) else None)
+            for c, g, gc in df_plan.itertuples(index=False)
+        }
+
+    @classmethod
+    def depuis_depenses(cls, annee, df, plan=None):
+        cube = cls(annee, plan)
+        if df.empty:
+            return cube
+
+        def objets(colonne):
+            s = df[colonne].astype(object)
+            return s.where(s.notna(), None)
+
+        montants = pd.to_numeric(df["montant_ttc"], errors="coerce").fillna(0.0)
+        mois = pd.to_datetime(df["date"], errors="coerce").dt.month.fillna(SANS_DATE).astype(int)
+        comptes = objets("compte").map(lambda c: None if c is None else str(c))
+        groupes = {c: cube._groupes(c) for c in comptes.dropna().unique()}
+
+        for depense_id, m, compte, fournisseur, type_, montant in zip(
+            objets("depense_id"), mois, comptes, objets("fournisseur"), objets("type"), montants
+        ):
+            cle = (m, compte, *groupes.get(compte, (None, None)), fournisseur, type_)
+            cellule = cube.cellules.setdefault(cle, [0.0, 0])
+            cellule[0] += montant
+            cellule[1] += 1
+            if depense_id is not None:
+                cube.lignes[depense_id] = (cle, montant)
+        return cube
+
+    # ---------- Clés
+    def _groupes(self, compte):
+        groupe, groupe_charges = self.plan.get(compte, (None, None))
+        return groupe or groupe_compte(compte), groupe_charges
+
+    def _cle(self, ligne, base=None):
+        """Clé de cellule d'une ligne ; les champs absents reprennent ceux de `base`."""
+        base = dict(zip(DIMENSIONS, base)) if base else {}
+
+        def champ(nom):
+            if nom in ligne:
+                v = ligne[nom]
+                return None if v is None or (isinstance(v, float) and pd.isna(v)) else v
+            return base.get(nom)
+
+        date = pd.to_datetime(ligne["date"], errors="coerce") if "date" in ligne else None
+        if date is None:
+            mois = base.get("mois", SANS_DATE)
+        else:
+            mois = SANS_DATE if pd.isna(date) else int(date.month)
+
+        compte = champ("compte")
+        compte = None if compte is None else str(compte)
+        groupe, groupe_charges = self._groupes(compte) if compte else (None, None)
+
+        return (mois, compte, groupe, groupe_charges, champ("fournisseur"), champ("type"))
+
+    @staticmethod
+    def _montant(ligne):
+        m = pd.to_numeric(ligne.get("montant_ttc"), errors="coerce")
+        return 0.0 if pd.isna(m) else float(m)
+
+    # ---------- Mise à jour incrémentale
+    def _deplacer(self, cle, montant, signe):
+        cellule = self.cellules.setdefault(cle, [0.0, 0])
+        cellule[0] += signe * montant
+        cellule[1] += signe
+        if cellule[1] == 0:
+            del self.cellules[cle]
+        self._frame = None
+
+    def _ajouter(self, ligne, signe, base=None):
+        cle = self._cle(ligne, base)
+        montant = self._montant(ligne)
+        self._deplacer(cle, montant, signe)
+        depense_id = ligne.get("depense_id")
+        if depense_id is not None and signe > 0:
+            self.lignes[depense_id] = (cle, montant)
+
+    def appliquer(self, ancienne=None, nouvelle=None):
+        """
+        Insertion (ancienne=None), suppression (nouvelle=None) ou mise à jour.
+        L'ancienne version est retrouvée par depense_id quand elle est connue,
+        les champs absents de `nouvelle` sont repris de l'ancienne version.
+        """
+        with self._lock:
+            base = None
+            if ancienne is not None:
+                connue = self.lignes.pop(ancienne.get("depense_id"), None)
+                if connue is not None:
+                    base, montant = connue
+                    self._deplacer(base, montant, -1)
+                else:
+                    self._deplacer(self._cle(ancienne), self._montant(ancienne), -1)
+            if nouvelle is not None:
+                self._ajouter(nouvelle, 1, base)
+
+    def reclasser(self, groupes):
+        """
+        Comptes reclassés : {compte_8: (groupe_compte, groupe_charges)}.
+        Seules les cellules de ces comptes changent de clé ; retourne leur nombre.
+        """
+        with self._lock:
+            self.plan.update(groupes)
+            deplacees = {}
+            for cle in [c for c in self.cellules if c[1] in groupes]:
+                nouvelle = (cle[0], cle[1], *self._groupes(cle[1]), cle[4], cle[5])
+                if nouvelle != cle:
+                    deplacees[cle] = nouvelle
+
+            # toutes les cellules d'un compte partagent ses anciens groupes :
+            # retirer puis reposer ne mélange pas deux cellules déplacées
+            valeurs = {cle: self.cellules.pop(cle) for cle in deplacees}
+            for cle, (total, nb) in valeurs.items():
+                cellule = self.cellules.setdefault(deplacees[cle], [0.0, 0])
+                cellule[0] += total
+                cellule[1] += nb
+
+            if deplacees:
+                for depense_id, (cle, montant) in self.lignes.items():
+                    if cle in deplacees:
+                        self.lignes[depense_id] = (deplacees[cle], montant)
+                self._frame = None
+            return len(deplacees)
+
+    # ---------- Lecture
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    [(*cle, total, nb) for cle, (total, nb) in self.cellules.items()],
+                    columns=DIMENSIONS + ["total", "nb"],
+                )
+            return self._frame
+
+    def filtrer(self, **filtres):
+        """Cellules dont chaque dimension vaut la valeur donnée (ou une des valeurs d'une liste)."""
+        df = self.frame()
+        for dim, valeur in filtres.items():
+            if valeur is None:
+                continue
+            if isinstance(valeur, (list, tuple, set)):
+                df = df[df[dim].isin(valeur)]
+            else:
+                df = df[df[dim] == valeur]
+        return df
+
+    def agreger(self, par, **filtres):
+        par = [par] if isinstance(par, str) else list(par)
+        return (
+            self.filtrer(**filtres)
+            .groupby(par, as_index=False, dropna=False)
+            .agg(total=("total", "sum"), nb=("nb", "sum"))
+        )
+
+    def kpi(self, **filtres):
+        df = self.filtrer(**filtres)
+        total = float(df["total"].sum())
+        nb = int(df["nb"].sum())
+        return {"total": total, "nb": nb, "moyenne": total / nb if nb else 0}
+
+    def mensuel(self, **filtres):
+        """Série mensuelle (mois au format AAAA-MM) ; None si aucune dépense datée."""
+        df = self.agreger("mois", **filtres)
+        df = df[df["mois"] != SANS_DATE]
+        if df.empty:
+            return None
+        return pd.DataFrame({
+            "mois": [f"{self.annee}-{int(m):02d}" for m in df["mois"]],
+            "total": df["total"].to_numpy(),
+        })
+
+
+# =========================================================
+# REGISTRE PARTAGÉ (UN CUBE PAR IMMEUBLE ET PAR ANNÉE, POUR TOUT LE PROCESS)
+# =========================================================
+_CUBES = {}                     # (immeuble, annee) -> CubeDepenses
+# modifications notifiées par (immeuble, annee) : une construction concurrente
+# qui en a manqué une n'est pas enregistrée
+_VERSIONS = {}
+_LOCK = threading.Lock()
+ESSAIS_CONSTRUCTION = 3
+
+
+def _modifier(predicat):
+    with _LOCK:
+        for cle in _VERSIONS:
+            if predicat(cle):
+                _VERSIONS[cle] += 1
+
+
+def get_cube(supabase, annee):
+    """
+    Cube de l'année, reconstruit quand le frame depenses a été rechargé pour une
+    autre raison qu'une écriture de l'application (TTL, rafraîchissement) ;
+    un cube construit sur un résultat de repli est servi mais pas conservé.
+    """
+    immeuble = immeuble_de(supabase)
+    cle = (immeuble, annee)
+    cle_frame = ("depenses", immeuble, annee)
+
+    for _ in range(ESSAIS_CONSTRUCTION):
+        with _LOCK:
+            cube = _CUBES.get(cle)
+            version = _VERSIONS.setdefault(cle, 0)
+
+        df = donnees.charger_depenses(supabase, annee)
+        charge_le = magasin.charge_le(cle_frame)
+        if cube is not None and (charge_le is None or (cube.source and cube.source[0] == charge_le)):
+            return cube
+
+        # frame rechargé : contenu inchangé ou écritures déjà appliquées par deltas
+        empreinte = donnees.empreinte(df)
+        if cube is not None and (cube.source is None or cube.source[1] == empreinte):
+            cube.source = (charge_le, empreinte)
+            return cube
+
+        plan = CubeDepenses.plan_depuis(donnees.charger_plan_comptable(supabase))
+        cube = CubeDepenses.depuis_depenses(
+            annee,
+            df.reindex(columns=["depense_id", "date", "compte", "fournisseur", "type", "montant_ttc"]),
+            plan
+        )
+        cube.source = (charge_le, empreinte)
+
+        if charge_le is None or resilience.est_perimee(cle_frame) or any(
+            resilience.est_perimee(c) for c in [("plan_comptable", None), ("plan_comptable_immeuble", immeuble)]
+        ):
+            return cube
+        with _LOCK:
+            if _VERSIONS.get(cle, 0) == version:
+                _CUBES[cle] = cube
+                return cube
+        # écriture notifiée pendant la construction : le frame lu peut la précéder
+
+    return cube
+
+
+def notifier_depense(annee, ancienne=None, nouvelle=None, immeuble=None):
+    """
+    À appeler après chaque écriture sur depenses (sans effet si l'année n'est pas chargée).
+    Le cube non restreint (tous immeubles) reçoit le même delta.
+    """
+    cles = [(i, annee) for i in {immeuble, None}]
+    _modifier(lambda cle: cle in cles)
+    with _LOCK:
+        cubes = [_CUBES.get(cle) for cle in cles]
+    for cube in cubes:
+        if cube is not None:
+            cube.appliquer(ancienne, nouvelle)
+            cube.source = None
+
+
+def reclasser(supabase, comptes):
+    """
+    Après une modification du plan comptable portant sur `comptes` :
+    les cubes déjà construits (toutes années) de l'immeuble du client, ou de tous
+    les immeubles pour un client non restreint, relisent le plan (surcharges
+    comprises) et ne déplacent que les cellules de ces comptes.
+    """
+    immeuble = immeuble_de(supabase)
+    comptes = [str(c) for c in comptes]
+    _modifier(lambda cle: immeuble is None or cle[0] in (immeuble, None))
+    with _LOCK:
+        cibles = [(i, c) for (i, _), c in _CUBES.items() if immeuble is None or i in (immeuble, None)]
+
+    plans = {}
+    for i, cube in cibles:
+        if i not in plans:
+            client = commun(supabase) if i is None else pour_immeuble(supabase, i)
+            plans[i] = CubeDepenses.plan_depuis(donnees.charger_plan_comptable(client))
+        cube.reclasser({c: plans[i].get(c, (None, None)) for c in comptes})
+
+
+def oublier(annee=None, immeuble=None):
+    """
+    Force la reconstruction au prochain accès ;
+    toutes les années si `annee` est None, tous les immeubles si `immeuble` est None.
+    """
+    def concerne(cle):
+        i, a = cle
+        return (immeuble is None or i in (immeuble, None)) and (annee is None or a == annee)
+
+    _modifier(concerne)
+    with _LOCK:
+        for cle in [c for c in _CUBES if concerne(c)]:
+            del _CUBES[cle]
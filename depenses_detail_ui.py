@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 
+import donnees
+import index_recherche
+
 
 def depenses_detail_ui(supabase, annee):
     st.title("📄 Détail des dépenses")
@@ -8,20 +11,12 @@ def depenses_detail_ui(supabase, annee):
     # =========================
     # Chargement des données
     # =========================
-    response = (
-        supabase
-        .table("v_depenses_detail")
-        .select("*")
-        .eq("annee", annee)
-        .execute()
-    )
+    df = donnees.charger_depenses_detail(supabase, annee)
 
-    if not response.data:
+    if df.empty:
         st.warning("Aucune dépense trouvée pour cette année.")
         return
 
-    df = pd.DataFrame(response.data)
-
     # =========================
     # Filtres
     # =========================
@@ -33,6 +28,15 @@ def depenses_detail_ui(supabase, annee):
     if groupe_sel != "Tous":
         df = df[df["groupe_charges"] == groupe_sel]
 
+    recherche = st.text_input(
+        "Recherche (poste, fournisseur, commentaire, libellé)",
+        key="depenses_detail_recherche"
+    )
+
+    if recherche and "depense_id" in df.columns:
+        trouves = index_recherche.get_index(supabase).rechercher(recherche, annee=annee)
+        df = df[df["depense_id"].isin(trouves)]
+
     # =========================
     # Tableau détail
     # =========================
@@ -1,7 +1,12 @@
 import streamlit as st
-import pandas as pd
 from datetime import date
 
+import cube
+import donnees
+import doublons
+import index_recherche
+from immeubles import immeuble_de
+
 
 def euro(x):
     if x is None:
@@ -9,48 +14,33 @@ def euro(x):
     return f"{x:,.2f} €".replace(",", " ").replace(".", ",")
 
 
+def notifier_depense(annee, ancienne=None, nouvelle=None, immeuble=None):
+    donnees.invalider("depenses", annee, immeuble)
+    cube.notifier_depense(annee, ancienne, nouvelle, immeuble)
+    # contrôle des doublons relancé au prochain affichage
+    doublons.oublier(immeuble)
+    index_recherche.notifier_depense(ancienne, nouvelle, immeuble)
+
+
 def depenses_ui(supabase, annee):
     st.header(f"📄 Dépenses – {annee}")
 
     # ======================================================
     # CHARGEMENT DÉPENSES
     # ======================================================
-    dep_resp = (
-        supabase
-        .table("depenses")
-        .select("""
-            depense_id,
-            annee,
-            date,
-            compte,
-            poste,
-            fournisseur,
-            montant_ttc,
-            lot_id,
-            commentaire
-        """)
-        .eq("annee", annee)
-        .execute()
-    )
+    df_dep = donnees.charger_depenses(supabase, annee)
 
-    if not dep_resp.data:
+    if df_dep.empty:
         st.warning("Aucune dépense pour cette année.")
         return
 
-    df_dep = pd.DataFrame(dep_resp.data)
-
     # ======================================================
     # PLAN COMPTABLE (pour groupe_charges)
     # ======================================================
-    plan_resp = (
-        supabase
-        .table("plan_comptable")
-        .select("compte_8, groupe_charges, libelle")
-        .execute()
+    df_plan = donnees.charger_plan_comptable(supabase).reindex(
+        columns=["compte_8", "groupe_charges", "libelle"]
     )
 
-    df_plan = pd.DataFrame(plan_resp.data)
-
     # ======================================================
     # ENRICHISSEMENT
     # ======================================================
@@ -61,11 +51,49 @@ def depenses_ui(supabase, annee):
         how="left"
     )
 
+    controle_doublons(supabase, annee)
+
+    depenses_filtrees(supabase, annee, df)
+
+
+def controle_doublons(supabase, annee):
+    rapport = doublons.get_rapport(supabase, annee)
+    kpi = rapport["kpi"]
+
+    if not any(kpi.values()):
+        return
+
+    with st.expander(
+        f"⚠️ Contrôle des saisies : {kpi['nb_doublons']} doublon(s) probable(s), "
+        f"{kpi['nb_avoirs_orphelins']} avoir(s) sans dépense, "
+        f"{kpi['nb_sinistres_sans_remboursement']} sinistre(s) sans remboursement"
+    ):
+        if kpi["nb_doublons"]:
+            st.markdown("**Doublons probables**")
+            st.dataframe(rapport["doublons"], use_container_width=True, hide_index=True)
+        if kpi["nb_avoirs_orphelins"]:
+            st.markdown("**Avoirs / remboursements sans dépense d'origine**")
+            st.dataframe(rapport["avoirs_orphelins"], use_container_width=True, hide_index=True)
+        if kpi["nb_sinistres_sans_remboursement"]:
+            st.markdown("**Sinistres sans remboursement**")
+            st.dataframe(rapport["sinistres_sans_remboursement"], use_container_width=True, hide_index=True)
+
+
+# Fragment : filtres, KPI, tableaux et récapitulatif se recalculent seuls
+# quand un filtre change ; chargement et enrichissement ne sont pas relancés.
+# Les écritures déclenchent st.rerun() qui relance toute la page.
+@st.fragment
+def depenses_filtrees(supabase, annee, df):
     # ======================================================
     # FILTRES
     # ======================================================
     st.subheader("🔎 Filtres")
 
+    recherche = st.text_input(
+        "Recherche (poste, fournisseur, commentaire, libellé)",
+        key="depenses_recherche"
+    )
+
     c1, c2, c3 = st.columns(3)
 
     with c1:
@@ -82,6 +110,21 @@ def depenses_ui(supabase, annee):
 
     df_f = df.copy()
 
+    if recherche:
+        index = index_recherche.get_index(supabase)
+        # grille et KPI : toutes les correspondances de l'année, sans plafond
+        trouves = index.rechercher(recherche, annee=annee, limite=None)
+        df_f = df_f[df_f["depense_id"].isin(trouves)]
+
+        # autres années : requête séparée, plafonnée pour l'affichage
+        de_l_annee = set(trouves)
+        autres = index.resultats([
+            i for i in index.rechercher(recherche, limite=None) if i not in de_l_annee
+        ][:index_recherche.LIMITE_RESULTATS])
+        if not autres.empty:
+            with st.expander(f"🔎 {len(autres)} résultat(s) sur les autres années"):
+                st.dataframe(autres, use_container_width=True, hide_index=True)
+
     if groupe_sel != "Tous":
         df_f = df_f[df_f["groupe_charges"] == groupe_sel]
 
@@ -96,9 +139,21 @@ def depenses_ui(supabase, annee):
     # ======================================================
     st.subheader("📊 Indicateurs")
 
-    total = df_f["montant_ttc"].sum()
-    nb = len(df_f)
-    moy = total / nb if nb else 0
+    # sans recherche plein texte, KPI et récapitulatif viennent du cube de l'année
+    filtres = {
+        "groupe_charges": None if groupe_sel == "Tous" else groupe_sel,
+        "compte": None if compte_sel == "Tous" else compte_sel,
+        "fournisseur": None if fournisseur_sel == "Tous" else fournisseur_sel,
+    }
+    cube_annee = None if recherche else cube.get_cube(supabase, annee)
+
+    if cube_annee is not None:
+        kpi = cube_annee.kpi(**filtres)
+        total, nb, moy = kpi["total"], kpi["nb"], kpi["moyenne"]
+    else:
+        total = df_f["montant_ttc"].sum()
+        nb = len(df_f)
+        moy = total / nb if nb else 0
 
     k1, k2, k3 = st.columns(3)
     k1.metric("Total dépenses", euro(total))
@@ -132,8 +187,9 @@ def depenses_ui(supabase, annee):
         )
 
         if st.button("💾 Enregistrer les modifications"):
+            originaux = df_view.set_index("depense_id")
             for _, r in edited.iterrows():
-                supabase.table("depenses").update({
+                donnees.ecrire(supabase.table("depenses").update({
                     "date": r["date"],
                     "compte": r["compte"],
                     "poste": r["poste"],
@@ -141,7 +197,14 @@ def depenses_ui(supabase, annee):
                     "montant_ttc": r["montant_ttc"],
                     "lot_id": r["lot_id"],
                     "commentaire": r["commentaire"],
-                }).eq("depense_id", r["depense_id"]).execute()
+                }).eq("depense_id", r["depense_id"]), "depenses", annee, immeuble_de(supabase))
+
+                notifier_depense(
+                    annee,
+                    ancienne={**originaux.loc[r["depense_id"]].to_dict(), "depense_id": r["depense_id"]},
+                    nouvelle={**r.to_dict(), "annee": annee},
+                    immeuble=immeuble_de(supabase)
+                )
 
             st.success("Modifications enregistrées")
             st.rerun()
@@ -154,9 +217,14 @@ def depenses_ui(supabase, annee):
         )
 
         if st.button("❌ Supprimer"):
-            supabase.table("depenses").delete().eq(
+            donnees.ecrire(supabase.table("depenses").delete().eq(
                 "depense_id", dep_del
-            ).execute()
+            ), "depenses", annee, immeuble_de(supabase))
+            notifier_depense(
+                annee,
+                ancienne=df_view[df_view["depense_id"] == dep_del].iloc[0].to_dict(),
+                immeuble=immeuble_de(supabase)
+            )
             st.success("Dépense supprimée")
             st.rerun()
 
@@ -172,7 +240,7 @@ def depenses_ui(supabase, annee):
             d_commentaire = st.text_area("Commentaire")
 
             if st.form_submit_button("Ajouter"):
-                supabase.table("depenses").insert({
+                nouvelle = {
                     "annee": annee,
                     "date": d_date,
                     "compte": d_compte,
@@ -181,7 +249,16 @@ def depenses_ui(supabase, annee):
                     "montant_ttc": d_montant,
                     "lot_id": d_lot,
                     "commentaire": d_commentaire,
-                }).execute()
+                }
+                res = donnees.ecrire(
+                    supabase.table("depenses").insert(nouvelle),
+                    "depenses", annee, immeuble_de(supabase)
+                )
+                notifier_depense(
+                    annee,
+                    nouvelle=(res.data or [nouvelle])[0],
+                    immeuble=immeuble_de(supabase)
+                )
 
                 st.success("Dépense ajoutée")
                 st.rerun()
@@ -191,13 +268,16 @@ def depenses_ui(supabase, annee):
     # ======================================================
     st.subheader("📊 Dépenses par groupe de charges")
 
-    recap = (
-        df_f
-        .groupby("groupe_charges", as_index=False)
-        .agg(
-            total=("montant_ttc", "sum"),
-            nb=("montant_ttc", "count")
+    if cube_annee is not None:
+        recap = cube_annee.agreger("groupe_charges", **filtres)
+    else:
+        recap = (
+            df_f
+            .groupby("groupe_charges", as_index=False)
+            .agg(
+                total=("montant_ttc", "sum"),
+                nb=("montant_ttc", "count")
+            )
         )
-    )
 
     st.dataframe(recap, use_container_width=True)
\ No newline at end of file
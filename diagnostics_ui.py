@@ -0,0 +1,134 @@
+import streamlit as st
+
+import invalidation
+import prechauffage
+import profilage
+import rendu
+import resilience
+from frames_store import magasin
+
+
+def diagnostics_ui():
+    st.header("🩺 Diagnostics")
+
+    # =========================
+    # CACHE DE FRAMES PARTAGÉ
+    # =========================
+    st.subheader("🗃️ Cache de frames partagé")
+
+    stats = magasin.stats()
+    lectures = stats["hits"] + stats["misses"]
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hits", stats["hits"])
+    c2.metric("Misses", stats["misses"])
+    c3.metric("Évictions", stats["evictions"])
+    c4.metric("Taux de hit", f"{stats['hits'] / lectures:.0%}" if lectures else "–")
+
+    st.progress(
+        min(stats["octets"] / stats["capacite_octets"], 1.0),
+        text=(
+            f"{stats['octets'] / 1024 / 1024:,.1f} Mo / "
+            f"{stats['capacite_octets'] / 1024 / 1024:,.0f} Mo "
+            f"({stats['entrees']} frame(s))"
+        )
+    )
+
+    st.dataframe(magasin.entrees(), use_container_width=True, hide_index=True)
+
+    # =========================
+    # CHARGE ENVOYÉE AU NAVIGATEUR
+    # =========================
+    st.subheader("📦 Charge Arrow du dernier rendu (session)")
+
+    payloads = rendu.payloads_session()
+    if not payloads:
+        st.info("Aucun rendu mesuré dans cette session.")
+    else:
+        st.metric("Total (Ko)", f"{sum(payloads.values()) / 1024:,.1f}")
+        st.dataframe(
+            [{"element": cle, "octets": octets} for cle, octets in payloads.items()],
+            use_container_width=True,
+            hide_index=True
+        )
+
+    # =========================
+    # BACKEND SUPABASE
+    # =========================
+    st.subheader("🔌 Backend Supabase")
+
+    etat = resilience.etat()
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Disjoncteur", etat["disjoncteur"])
+    c2.metric("Appels", etat["appels"])
+    c3.metric("Échecs", etat["echecs"])
+    c4.metric("Servis en repli", etat["replis"])
+
+    st.caption(
+        f"Reprises : {etat['reprises']} · délais dépassés : {etat['delais_depasses']} · "
+        f"appels refusés (disjoncteur) : {etat['refus']} · "
+        f"clés servies en repli : {etat['cles_perimees']} · "
+        f"frames gardés pour le repli (magasin) : {stats['en_repli']}"
+    )
+
+    # =========================
+    # PRÉCHAUFFAGE ET RAFRAÎCHISSEMENT
+    # =========================
+    st.subheader("♨️ Préchauffage des caches")
+
+    chauffe = prechauffage.etat()
+    if chauffe is None:
+        st.info("Préchauffage non démarré.")
+    else:
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Statut", chauffe["statut"])
+        c2.metric("Année", chauffe["annee"])
+        c3.metric("Cycles", chauffe["cycles"])
+        c4.metric(
+            "Dernier cycle",
+            f"{chauffe['dernier_cycle'][1] * 1000:,.0f} ms" if chauffe["dernier_cycle"] else "–"
+        )
+
+        st.progress(chauffe["progression"], text=f"{chauffe['progression']:.0%} des étapes du cycle en cours")
+        if not chauffe["etapes"].empty:
+            st.dataframe(chauffe["etapes"], use_container_width=True, hide_index=True)
+        st.caption(
+            (f"Rafraîchissement toutes les {chauffe['periode'] / 60:,.0f} min"
+             if chauffe["periode"] else "Rafraîchissement périodique désactivé")
+            + f" · {len(chauffe['immeubles'])} immeuble(s)"
+        )
+
+    # =========================
+    # BUS D'INVALIDATION
+    # =========================
+    st.subheader("🔁 Invalidation entre sessions")
+
+    bus = invalidation.etat()
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Canal", bus["canal"])
+    c2.metric("Vérifications", bus["verifications"])
+    c3.metric("Publications", bus["publications"])
+    c4.metric("Purges reçues", bus["invalidations"])
+
+    if bus["versions"]:
+        st.dataframe(
+            [{"table:immeuble:année": cle, "version": v} for cle, v in sorted(bus["versions"].items())],
+            use_container_width=True,
+            hide_index=True
+        )
+    st.caption(f"TTL du cache de frames : {magasin.ttl / 60:,.0f} min (filet de sécurité)")
+
+    # =========================
+    # PROFILS DE RENDU
+    # =========================
+    st.subheader("🔥 Points chauds par page (dernier rendu profilé)")
+
+    if not profilage.derniers:
+        st.info("Aucun profil : lancer avec IMMEUBLE_PROFIL=case (ou =1) et cocher « Profiler les pages ».")
+
+    for page, profil in profilage.derniers.items():
+        with st.expander(f"{page} – {profil['duree'] * 1000:,.0f} ms"):
+            st.dataframe(profil["points_chauds"], use_container_width=True, hide_index=True)
+            st.caption(profil["fichier"])
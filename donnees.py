@@ -0,0 +1,349 @@
+import threading
+
+import pandas as pd
+
+import invalidation
+import resilience
+from frames_store import magasin
+from immeubles import commun, immeuble_de, surcharger_plan
+
+
+# =========================================================
+# CHARGEMENTS PARTAGÉS (LECTURE SEULE)
+# =========================================================
+# Clés du magasin : (table, immeuble, année...) ; immeuble None = client non restreint.
+TAILLE_PAGE = 1000              # plafond par défaut d'une réponse PostgREST
+
+
+def _frame(resp):
+    return pd.DataFrame(resp.data or [])
+
+
+def empreinte(df):
+    """Empreinte du contenu d'un frame (détection d'un rechargement différent)."""
+    return int(pd.util.hash_pandas_object(df, index=False).sum()) if not df.empty else 0
+
+
+class _Reponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class Paginee:
+    """
+    Lecture exécutée page par page (.range) : PostgREST tronque silencieusement
+    une réponse au-delà de max-rows. `construire()` renvoie la requête, triée
+    sur une clé unique pour que les pages ne se chevauchent pas.
+    Chaque page est un appel résilient (délai et reprises propres) ; le repli
+    porte sur le chargement complet (cf. _lire).
+    """
+
+    def __init__(self, construire, taille=TAILLE_PAGE):
+        self.construire = construire
+        self.taille = taille
+
+    def executer(self, cle=None):
+        lignes = []
+        while True:
+            page = resilience.executer(
+                self.construire().range(len(lignes), len(lignes) + self.taille - 1)
+            ).data or []
+            lignes.extend(page)
+            if len(page) < self.taille:
+                break
+        if cle is not None:
+            resilience.fraiche(cle)
+        return _Reponse(lignes)
+
+
+def _lire(cle, requete):
+    """
+    Frame lu via `requete` (appel résilient, ou Paginee) ; backend indisponible :
+    dernier frame de `cle` gardé par le magasin (même invalidé), signalé comme périmé.
+    """
+    try:
+        if isinstance(requete, Paginee):
+            return _frame(requete.executer(cle))
+        return _frame(resilience.executer(requete, cle=cle))
+    except resilience.BackendIndisponible as e:
+        return resilience.servir_repli(cle, magasin.repli(cle), e)
+
+
+def _obtenir(cle, requete, forcer=False):
+    """
+    Frame `cle` depuis le magasin, ou via `requete`.
+    Un résultat de repli (périmé) est servi mais pas redéposé dans le magasin,
+    pour être relu dès que le backend répond à nouveau.
+    `forcer` relit le backend et remplace l'entrée sans la retirer au préalable
+    (rafraîchissement en arrière-plan : les sessions gardent l'ancienne version d'ici là).
+    """
+    df = None if forcer else magasin.lire(cle)
+    if df is not None:
+        return df
+
+    df = _lire(cle, requete)
+    if not resilience.est_perimee(cle):
+        magasin.deposer(cle, df)
+    return df.copy(deep=False)
+
+
+TTL_SANS_IMMEUBLES = 300       # secondes avant de redemander une table immeubles absente
+
+
+def charger_immeubles(supabase, forcer=False):
+    """
+    Immeubles [id, nom] ; vide si la table n'existe pas (migration non appliquée) :
+    ce résultat négatif est conservé TTL_SANS_IMMEUBLES secondes, l'application
+    fonctionne alors sans restriction par immeuble.
+    """
+    cle = ("immeubles", None)
+    try:
+        return _obtenir(
+            cle,
+            commun(supabase)
+            .table("immeubles")
+            .select("id, nom")
+            .order("nom"),
+            forcer=forcer
+        )
+    except resilience.BackendIndisponible:
+        raise
+    except Exception:
+        vide = pd.DataFrame(columns=["id", "nom"])
+        magasin.deposer(cle, vide, ttl=TTL_SANS_IMMEUBLES)
+        return vide.copy(deep=False)
+
+
+def charger_depenses(supabase, annee, forcer=False):
+    return _obtenir(
+        ("depenses", immeuble_de(supabase), annee),
+        supabase
+        .table("depenses")
+        .select("*")
+        .eq("annee", annee),
+        forcer=forcer
+    )
+
+
+def charger_depenses_annees(supabase, annees):
+    """
+    Dépenses de plusieurs années : les années absentes du magasin sont lues
+    en un seul chargement paginé puis rangées année par année.
+    """
+    immeuble = immeuble_de(supabase)
+    manquantes = [a for a in annees if not magasin.contient(("depenses", immeuble, a))]
+    perimees = {}
+
+    if manquantes:
+        try:
+            df = _frame(Paginee(lambda: (
+                supabase
+                .table("depenses")
+                .select("*")
+                .in_("annee", manquantes)
+                .order("depense_id")
+            )).executer())
+        except resilience.BackendIndisponible as e:
+            # repli année par année sur les frames gardés par le magasin
+            for annee in manquantes:
+                cle = ("depenses", immeuble, annee)
+                perimees[annee] = resilience.servir_repli(cle, magasin.repli(cle), e)
+        else:
+            for annee in manquantes:
+                cle = ("depenses", immeuble, annee)
+                magasin.deposer(cle, df[df["annee"] == annee].reset_index(drop=True) if not df.empty else df)
+                resilience.fraiche(cle)
+
+    return pd.concat(
+        [perimees[a] if a in perimees else charger_depenses(supabase, a) for a in annees],
+        ignore_index=True
+    )
+
+
+def charger_depenses_toutes_annees(supabase, forcer=False):
+    """
+    Dépenses de toutes les années, en un frame (chargement paginé).
+    Après une écriture datée, seules les tranches des années modifiées
+    sont relues et remplacées dans le frame (cf. purger).
+    """
+    immeuble = immeuble_de(supabase)
+    cle = ("depenses", immeuble)
+    with _lock:
+        annees = sorted(_tranches.pop(cle, ()))
+
+    df = magasin.lire(cle) if annees and not forcer else None
+    if df is None:
+        return _obtenir(
+            cle,
+            Paginee(lambda: (
+                supabase
+                .table("depenses")
+                .select("*")
+                .order("depense_id")
+            )),
+            forcer=forcer
+        )
+
+    tranches = charger_depenses_annees(supabase, annees)
+    autres = df[~df["annee"].isin(annees)] if not df.empty else df
+    if not tranches.empty:
+        df = pd.concat([autres, tranches], ignore_index=True).sort_values("depense_id", ignore_index=True)
+    else:
+        df = autres.reset_index(drop=True)
+
+    # tranche servie en repli : à relire au prochain accès
+    if any(resilience.est_perimee(("depenses", immeuble, a)) for a in annees):
+        with _lock:
+            _tranches.setdefault(cle, set()).update(annees)
+        return df
+    magasin.deposer(cle, df)
+    return df.copy(deep=False)
+
+
+def charger_depenses_detail(supabase, annee):
+    return _obtenir(
+        ("v_depenses_detail", immeuble_de(supabase), annee),
+        supabase
+        .table("v_depenses_detail")
+        .select("*")
+        .eq("annee", annee)
+    )
+
+
+def charger_budgets(supabase, annee, forcer=False):
+    return _obtenir(
+        ("budgets", immeuble_de(supabase), annee),
+        supabase
+        .table("budgets")
+        .select("*")
+        .eq("annee", annee),
+        forcer=forcer
+    )
+
+
+def charger_repartition(supabase, forcer=False):
+    return _obtenir(
+        ("repartition_depenses", immeuble_de(supabase)),
+        Paginee(lambda: (
+            supabase
+            .table("repartition_depenses")
+            .select("depense_id, lot_id, quote_part")
+            .order("depense_id")
+            .order("lot_id")
+        )),
+        forcer=forcer
+    )
+
+
+def charger_plan_comptable(supabase, forcer=False):
+    """Plan commun, surchargé par les comptes propres à l'immeuble du client."""
+    cle_commun = ("plan_comptable", None)
+    plan = _obtenir(
+        cle_commun,
+        commun(supabase)
+        .table("plan_comptable")
+        .select("*")
+        .order("groupe_compte")
+        .order("compte_8"),
+        forcer=forcer
+    )
+
+    immeuble = immeuble_de(supabase)
+    if immeuble is None:
+        return plan
+
+    surcharges = charger_surcharges_plan(supabase, forcer=forcer)
+
+    cle = ("plan_comptable", immeuble)
+    if resilience.est_perimee(cle_commun) or resilience.est_perimee(("plan_comptable_immeuble", immeuble)):
+        return surcharger_plan(plan, surcharges)
+    if forcer:
+        df = surcharger_plan(plan, surcharges)
+        magasin.deposer(cle, df)
+        return df.copy(deep=False)
+    return magasin.obtenir(cle, lambda: surcharger_plan(plan, surcharges))
+
+
+def charger_surcharges_plan(supabase, forcer=False):
+    """Comptes surchargés (ou propres) à l'immeuble du client."""
+    return _obtenir(
+        ("plan_comptable_immeuble", immeuble_de(supabase)),
+        supabase
+        .table("plan_comptable_immeuble")
+        .select("*"),
+        forcer=forcer
+    )
+
+
+# =========================================================
+# ÉCRITURES
+# =========================================================
+def ecrire(requete, table, annee=None, immeuble=None):
+    """
+    Exécute une écriture (insert / update / delete) sur `table` sous délai, sans reprise.
+    Sans réponse du backend, l'écriture a pu aboutir : tous les caches dérivés
+    de `table` sont purgés (ici et dans les autres process) avant de remonter l'erreur.
+    """
+    try:
+        return resilience.executer(requete, lecture=False)
+    except resilience.EcritureIncertaine:
+        invalidation.appliquer(table, annee, immeuble)
+        invalidation.publier(table, annee, immeuble)
+        raise
+
+
+# =========================================================
+# INVALIDATION APRÈS ÉCRITURE
+# =========================================================
+DEPENDANCES = {
+    "depenses": ["depenses", "v_depenses_detail"],
+    "budgets": ["budgets"],
+    "plan_comptable": ["plan_comptable", "v_depenses_detail"],
+    "plan_comptable_immeuble": ["plan_comptable_immeuble", "plan_comptable"],
+}
+
+
+# frames toutes années (table, immeuble) de ces tables : une écriture datée
+# n'en invalide que la tranche de l'année, relue au prochain accès
+TABLES_PAR_ANNEE = ("depenses",)
+_tranches = {}                  # (table, immeuble) -> années à relire
+_lock = threading.Lock()
+
+
+def purger(table, annee=None, immeuble=None):
+    """
+    Retire du magasin les frames dérivés de `table`
+    (pour une année donnée, ou toutes si `annee` est None ;
+    pour un immeuble et les vues non restreintes, ou tous si `immeuble` est None).
+    Clés (table, immeuble) : frames sans année, purgés par toute écriture,
+    sauf pour TABLES_PAR_ANNEE où une écriture datée ne marque que sa tranche.
+    """
+    tables = DEPENDANCES.get(table, [table])
+
+    def concernee(cle):
+        return cle[0] in tables and (immeuble is None or cle[1] in (immeuble, None))
+
+    def purgee(cle):
+        if not concernee(cle):
+            return False
+        if annee is None:
+            return True
+        if len(cle) >= 3:
+            return cle[2] == annee
+        return cle[0] not in TABLES_PAR_ANNEE
+
+    with _lock:
+        if annee is None:
+            for cle in [c for c in _tranches if concernee(c)]:
+                del _tranches[cle]
+        else:
+            for cle in magasin.cles():
+                if len(cle) == 2 and cle[0] in TABLES_PAR_ANNEE and concernee(cle):
+                    _tranches.setdefault(cle, set()).add(annee)
+    magasin.invalider(purgee)
+
+
+def invalider(table, annee=None, immeuble=None):
+    """Après une écriture : purge locale, puis publication aux autres sessions / process."""
+    purger(table, annee, immeuble)
+    invalidation.publier(table, annee, immeuble)
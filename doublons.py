@@ -0,0 +1,262 @@
+"""
+Détection des doublons probables et des avoirs / remboursements non appariés.
+
+Un seul passage vectorisé sur les dépenses de plusieurs années :
+- fournisseurs rapprochés par nom normalisé puis par similarité trigramme
+  (sur les seuls noms distincts) ;
+- doublons : même fournisseur, même montant et dates à moins de FENETRE_JOURS
+  (hachage par fenêtre de dates, comparé à la fenêtre voisine), ou même pièce
+  et même montant ; deux pièces renseignées et différentes ne sont jamais un doublon ;
+- avoirs sans dépense antérieure du même fournisseur, sinistres sans remboursement.
+
+Le coût est linéaire en nombre de lignes (hors tri des rapprochements avoir / dépense) :
+le contrôle est relancé après chaque enregistrement.
+"""
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+import donnees
+from immeubles import immeuble_de
+from index_recherche import mots, trigrammes
+
+FENETRE_JOURS = 7                  # écart maximal entre deux saisies d'une même facture
+FENETRE_AVOIR_JOURS = 365          # recherche de la dépense d'origine d'un avoir
+SEUIL_SIMILARITE = 0.6             # Jaccard trigrammes entre noms de fournisseurs
+COMPTES_A_REMBOURSER = ("678",)    # sinistres : un remboursement est attendu
+FORMES_JURIDIQUES = {"sa", "sas", "sasu", "sarl", "eurl", "sci", "ste", "societe", "ets", "cie", "et"}
+
+COLONNES = ["depense_id", "annee", "date", "compte", "poste", "fournisseur", "montant_ttc", "piece_id"]
+
+
+# =========================================================
+# FOURNISSEURS
+# =========================================================
+def cle_fournisseur(nom):
+    return "".join(m for m in mots(nom) if m not in FORMES_JURIDIQUES)
+
+
+def regrouper_fournisseurs(noms):
+    """nom -> nom canonique ; les noms proches (fautes de frappe, forme juridique) sont fusionnés."""
+    cles = {nom: cle_fournisseur(nom) for nom in set(noms)}
+    distinctes = sorted({c for c in cles.values() if c})
+
+    parent = {c: c for c in distinctes}
+
+    def racine(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    tri_par_cle = {c: trigrammes(c) for c in distinctes}
+    postings = defaultdict(list)
+    for c, tris in tri_par_cle.items():
+        for t in tris:
+            postings[t].append(c)
+
+    for c, tris in tri_par_cle.items():
+        communs = Counter(autre for t in tris for autre in postings[t] if autre > c)
+        for autre, n in communs.items():
+            if n / len(tris | tri_par_cle[autre]) >= SEUIL_SIMILARITE:
+                a, b = racine(c), racine(autre)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+    return {nom: racine(c) if c else "" for nom, c in cles.items()}
+
+
+# =========================================================
+# PRÉPARATION
+# =========================================================
+def preparer(df):
+    df = df.reindex(columns=COLONNES).reset_index(drop=True)
+
+    montants = pd.to_numeric(df["montant_ttc"], errors="coerce").fillna(0.0)
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    fournisseurs = df["fournisseur"].fillna("").astype(str)
+    pieces = df["piece_id"].astype(object).where(df["piece_id"].notna(), "")
+
+    canon = regrouper_fournisseurs(fournisseurs.unique())
+
+    return df.assign(
+        montant_ttc=montants,
+        date=dates,
+        cents=(montants * 100).round().astype("int64"),
+        jour=(dates - pd.Timestamp("1970-01-01")).dt.days,
+        fournisseur_canon=fournisseurs.map(canon),
+        piece=pieces.astype(str).str.strip(),
+    )
+
+
+# =========================================================
+# DOUBLONS
+# =========================================================
+def _paires(a, b, cles):
+    p = a.merge(b, on=cles, suffixes=("_1", "_2"))
+    return p[p["depense_id_1"] != p["depense_id_2"]]
+
+
+def doublons(df):
+    """df préparé -> une ligne par paire de dépenses probablement saisies deux fois."""
+    base = df[["depense_id", "jour", "piece", "fournisseur_canon", "cents"]]
+
+    # --- même fournisseur, même montant, dates proches : hachage par fenêtre
+    # montants nuls (lignes de mémo) exclus
+    datees = base[
+        base["jour"].notna() & (base["fournisseur_canon"] != "") & (base["cents"] != 0)
+    ].copy()
+    datees["h"] = pd.util.hash_pandas_object(datees[["fournisseur_canon", "cents"]], index=False).to_numpy()
+    datees["fenetre"] = (datees["jour"] // FENETRE_JOURS).astype("int64")
+
+    voisines = datees.assign(fenetre=datees["fenetre"] - 1)
+    par_fenetre = pd.concat([
+        _paires(datees, datees, ["h", "fenetre"]),
+        _paires(datees, voisines, ["h", "fenetre"]),
+    ])
+    par_fenetre = par_fenetre[
+        (par_fenetre["fournisseur_canon_1"] == par_fenetre["fournisseur_canon_2"])
+        & (par_fenetre["cents_1"] == par_fenetre["cents_2"])
+        & ((par_fenetre["jour_1"] - par_fenetre["jour_2"]).abs() <= FENETRE_JOURS)
+        & ~(
+            (par_fenetre["piece_1"] != "")
+            & (par_fenetre["piece_2"] != "")
+            & (par_fenetre["piece_1"] != par_fenetre["piece_2"])
+        )
+    ].assign(motif="même fournisseur et montant, dates proches")
+
+    # --- même pièce, même montant (dates indifférentes)
+    avec_piece = base[base["piece"] != ""]
+    par_piece = _paires(avec_piece, avec_piece, ["piece", "cents"]).assign(
+        motif="même pièce et montant"
+    )
+
+    paires = pd.concat([par_piece, par_fenetre], ignore_index=True)[
+        ["depense_id_1", "depense_id_2", "motif"]
+    ]
+    if paires.empty:
+        return pd.DataFrame(columns=[
+            "depense_id_1", "depense_id_2", "annee", "date_1", "date_2",
+            "fournisseur_1", "fournisseur_2", "montant_ttc", "ecart_jours", "motif",
+        ])
+
+    # chaque paire une seule fois, dans l'ordre des identifiants
+    ids = np.sort(paires[["depense_id_1", "depense_id_2"]].to_numpy(), axis=1)
+    paires = (
+        paires.assign(depense_id_1=ids[:, 0], depense_id_2=ids[:, 1])
+        .drop_duplicates(["depense_id_1", "depense_id_2"])
+    )
+
+    infos = df.set_index("depense_id")[["annee", "date", "fournisseur", "montant_ttc"]]
+    paires = paires.join(infos.add_suffix("_1"), on="depense_id_1").join(infos.add_suffix("_2"), on="depense_id_2")
+
+    return pd.DataFrame({
+        "depense_id_1": paires["depense_id_1"],
+        "depense_id_2": paires["depense_id_2"],
+        "annee": paires["annee_2"],
+        "date_1": paires["date_1"],
+        "date_2": paires["date_2"],
+        "fournisseur_1": paires["fournisseur_1"],
+        "fournisseur_2": paires["fournisseur_2"],
+        "montant_ttc": paires["montant_ttc_1"],
+        "ecart_jours": (paires["date_2"] - paires["date_1"]).dt.days.abs(),
+        "motif": paires["motif"],
+    }).sort_values(["date_1", "depense_id_1"]).reset_index(drop=True)
+
+
+# =========================================================
+# AVOIRS / REMBOURSEMENTS
+# =========================================================
+def _rapprocher(gauche, droite, direction):
+    """Pour chaque ligne de gauche, la ligne de droite du même fournisseur la plus proche dans le temps."""
+    gauche = gauche.sort_values("jour")
+    droite = droite.sort_values("jour")[["jour", "fournisseur_canon", "depense_id"]]
+    return pd.merge_asof(
+        gauche,
+        droite.rename(columns={"depense_id": "contrepartie_id"}),
+        on="jour",
+        by="fournisseur_canon",
+        direction=direction,
+        tolerance=FENETRE_AVOIR_JOURS,
+    )
+
+
+def non_apparies(df):
+    """(avoirs sans dépense antérieure, sinistres sans remboursement ultérieur)"""
+    colonnes = ["depense_id", "annee", "date", "compte", "poste", "fournisseur", "montant_ttc"]
+    datees = df[df["jour"].notna()].assign(jour=lambda d: d["jour"].astype("int64"))
+    credits = datees[datees["cents"] < 0]
+    debits = datees[datees["cents"] > 0]
+
+    avoirs = _rapprocher(credits, debits, "backward")
+    avoirs = avoirs[avoirs["contrepartie_id"].isna()][colonnes]
+
+    sinistres = debits[debits["compte"].astype(str).str.startswith(COMPTES_A_REMBOURSER)]
+    sinistres = _rapprocher(sinistres, credits, "forward")
+    sinistres = sinistres[sinistres["contrepartie_id"].isna()][colonnes]
+
+    return avoirs.reset_index(drop=True), sinistres.reset_index(drop=True)
+
+
+def detecter(df):
+    df = preparer(df)
+    paires = doublons(df)
+    avoirs, sinistres = non_apparies(df)
+    return {
+        "kpi": {
+            "nb_doublons": int(len(paires)),
+            "nb_avoirs_orphelins": int(len(avoirs)),
+            "nb_sinistres_sans_remboursement": int(len(sinistres)),
+        },
+        "doublons": paires,
+        "avoirs_orphelins": avoirs,
+        "sinistres_sans_remboursement": sinistres,
+    }
+
+
+def pour_annee(rapport, annee):
+    """Restreint un rapport multi-années aux constats de `annee`."""
+    tables = {
+        nom: rapport[nom][rapport[nom]["annee"] == annee].reset_index(drop=True)
+        for nom in ["doublons", "avoirs_orphelins", "sinistres_sans_remboursement"]
+    }
+    return {
+        "kpi": {
+            "nb_doublons": len(tables["doublons"]),
+            "nb_avoirs_orphelins": len(tables["avoirs_orphelins"]),
+            "nb_sinistres_sans_remboursement": len(tables["sinistres_sans_remboursement"]),
+        },
+        **tables,
+    }
+
+
+# =========================================================
+# RAPPORTS PARTAGÉS (RECALCULÉS APRÈS CHAQUE ÉCRITURE)
+# =========================================================
+_RAPPORTS = {}                  # immeuble -> rapport toutes années
+_LOCK = threading.Lock()
+
+
+def get_rapport(supabase, annee):
+    """
+    Constats de `annee`. La détection porte sur toutes les années : une saisie
+    en double ou l'origine d'un avoir peut se trouver dans n'importe quelle année
+    antérieure ; un seul calcul par immeuble sert toutes les années.
+    """
+    immeuble = immeuble_de(supabase)
+    with _LOCK:
+        rapport = _RAPPORTS.get(immeuble)
+    if rapport is None:
+        rapport = detecter(donnees.charger_depenses_toutes_annees(supabase))
+        with _LOCK:
+            rapport = _RAPPORTS.setdefault(immeuble, rapport)
+    return pour_annee(rapport, annee)
+
+
+def oublier(immeuble=None):
+    """Tous les immeubles si `immeuble` est None."""
+    with _LOCK:
+        for cle in [c for c in _RAPPORTS if immeuble is None or c in (immeuble, None)]:
+            del _RAPPORTS[cle]
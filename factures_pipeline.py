@@ -0,0 +1,322 @@
+"""
+Rapprochement factures PDF ↔ dépenses (traitement batch, hors Streamlit).
+
+    python factures_pipeline.py --annee 2025
+    python factures_pipeline.py --annee 2025 --csv data/base_depenses_immeuble.csv --sortie rapprochement.csv
+
+1. extraction du texte, des montants et des dates de chaque PDF sur un pool de processus,
+   avec cache par empreinte SHA-256 (un fichier identique n'est lu qu'une fois) ;
+2. proposition de correspondances avec les dépenses de l'année
+   (pièce, fournisseur, montant, date) via des index montant → dépenses et pièce → dépense.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from index_recherche import mots
+
+DOSSIER_FACTURES = Path("factures")
+DOSSIER_CACHE = Path(".cache/factures")
+VERSION_EXTRACTION = 1          # à incrémenter si les règles d'extraction changent
+FENETRE_JOURS = 60              # écart de date au-delà duquel la date ne compte plus
+SCORE_MIN = 0.5
+NB_PROPOSITIONS = 3
+
+RE_MONTANT = re.compile(r"(?<![\d.,])(\d{1,3}(?:[  ]\d{3})+|\d+)[.,](\d{2})(?![\d])(\s*€)?")
+RE_DATE = re.compile(r"\b(\d{2})[/.-](\d{2})[/.-](\d{4}|\d{2})\b")
+RE_NOM_FICHIER = re.compile(r"^(\d{4})\s*-\s*(.+?)\s*-\s*(\d+)$")
+
+
+# =========================================================
+# EXTRACTION (EXÉCUTÉE DANS LES PROCESSUS DU POOL)
+# =========================================================
+def empreinte(chemin):
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def _montant(entier, decimales):
+    return float(re.sub(r"[  ]", "", entier) + "." + decimales)
+
+
+def analyser_texte(texte):
+    montants = []
+    montants_euro = []
+    for m in RE_MONTANT.finditer(texte):
+        valeur = _montant(m.group(1), m.group(2))
+        montants.append(valeur)
+        if m.group(3):
+            montants_euro.append(valeur)
+
+    dates = []
+    for j, mo, a in RE_DATE.findall(texte):
+        a = int(a) + 2000 if len(a) == 2 else int(a)
+        d = pd.to_datetime(f"{a}-{mo}-{j}", errors="coerce")
+        if not pd.isna(d):
+            dates.append(d.date().isoformat())
+
+    # le TTC est le montant en euros le plus répété (total, net à payer, règlement)
+    montant_ttc = None
+    candidats = [v for v in montants_euro if v > 0] or [v for v in montants if v > 0]
+    if candidats:
+        compte = Counter(candidats)
+        montant_ttc = max(compte, key=lambda v: (compte[v], v))
+
+    return {
+        "montant_ttc": montant_ttc,
+        "montants": sorted(set(montants)),
+        "date": dates[0] if dates else None,
+        "dates": sorted(set(dates)),
+    }
+
+
+def extraire(chemin):
+    """Extraction d'un PDF : texte + montants + dates (ou l'erreur rencontrée)."""
+    from pypdf import PdfReader
+
+    try:
+        lecteur = PdfReader(chemin)
+        texte = "\n".join(page.extract_text() or "" for page in lecteur.pages)
+    except Exception as e:
+        return {"version": VERSION_EXTRACTION, "erreur": f"{type(e).__name__}: {e}"}
+
+    return {"version": VERSION_EXTRACTION, "texte": texte, **analyser_texte(texte)}
+
+
+# =========================================================
+# CACHE PAR EMPREINTE
+# =========================================================
+def lire_cache(h):
+    chemin = DOSSIER_CACHE / f"{h}.json"
+    if not chemin.exists():
+        return None
+    with open(chemin, encoding="utf-8") as f:
+        resultat = json.load(f)
+    return resultat if resultat.get("version") == VERSION_EXTRACTION else None
+
+
+def ecrire_cache(h, resultat):
+    DOSSIER_CACHE.mkdir(parents=True, exist_ok=True)
+    tmp = DOSSIER_CACHE / f"{h}.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(resultat, f, ensure_ascii=False)
+    os.replace(tmp, DOSSIER_CACHE / f"{h}.json")
+
+
+def lister_factures(dossier, annee=None):
+    fichiers = []
+    for chemin in sorted(Path(dossier).rglob("*")):
+        if not chemin.is_file() or chemin.name.startswith("."):
+            continue
+        m = RE_NOM_FICHIER.match(chemin.stem)
+        if not m:
+            continue
+        if annee is not None and int(m.group(1)) != annee:
+            continue
+        fichiers.append(chemin)
+    return fichiers
+
+
+def extraire_factures(fichiers, workers=None):
+    """
+    Retourne un DataFrame (une ligne par fichier).
+    Seules les empreintes absentes du cache sont analysées, chacune une seule fois.
+    """
+    empreintes = {chemin: empreinte(chemin) for chemin in fichiers}
+
+    resultats = {}
+    a_traiter = {}
+    for chemin, h in empreintes.items():
+        if h in resultats or h in a_traiter:
+            continue
+        cache = lire_cache(h)
+        if cache is not None:
+            resultats[h] = cache
+        else:
+            a_traiter[h] = chemin
+
+    if a_traiter:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for h, resultat in zip(a_traiter, pool.map(extraire, a_traiter.values())):
+                ecrire_cache(h, resultat)
+                resultats[h] = resultat
+
+    lignes = []
+    for chemin, h in empreintes.items():
+        annee, fournisseur, numero = RE_NOM_FICHIER.match(chemin.stem).groups()
+        r = resultats[h]
+        lignes.append({
+            "fichier": str(chemin),
+            "empreinte": h,
+            "annee": int(annee),
+            "fournisseur": fournisseur,
+            "piece_id": f"{fournisseur} - {numero}",
+            "montant_ttc": r.get("montant_ttc"),
+            "montants": r.get("montants", []),
+            "date": r.get("date"),
+            "erreur": r.get("erreur"),
+        })
+
+    print(
+        f"{len(fichiers)} fichier(s), {len(resultats)} contenu(s) distinct(s), "
+        f"{len(a_traiter)} analysé(s), {len(resultats) - len(a_traiter)} depuis le cache",
+        file=sys.stderr
+    )
+    return pd.DataFrame(lignes)
+
+
+# =========================================================
+# RAPPROCHEMENT
+# =========================================================
+def _centimes(montant):
+    return int(round(abs(float(montant)) * 100))
+
+
+def _similarite(a, b):
+    a, b = set(mots(a)), set(mots(b))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def rapprocher(df_factures, df_depenses):
+    """Propose jusqu'à NB_PROPOSITIONS dépenses par facture, triées par score."""
+    par_montant = defaultdict(list)
+    par_piece = {}
+    depenses = df_depenses.to_dict("records")
+
+    for i, d in enumerate(depenses):
+        if pd.notna(d.get("montant_ttc")):
+            par_montant[_centimes(d["montant_ttc"])].append(i)
+        if pd.notna(d.get("piece_id")):
+            par_piece[str(d["piece_id"]).strip().upper()] = i
+
+    propositions = []
+    for f in df_factures.to_dict("records"):
+        candidats = set()
+        for montant in f["montants"]:
+            candidats.update(par_montant.get(_centimes(montant), ()))
+        piece = par_piece.get(f["piece_id"].upper())
+        if piece is not None:
+            candidats.add(piece)
+
+        date_f = pd.to_datetime(f["date"], errors="coerce")
+        scores = []
+        for i in candidats:
+            d = depenses[i]
+            score = 0.0
+            # candidat trouvé par pièce : son montant peut être vide
+            if (
+                pd.notna(f["montant_ttc"])
+                and pd.notna(d.get("montant_ttc"))
+                and _centimes(d["montant_ttc"]) == _centimes(f["montant_ttc"])
+            ):
+                score += 0.4
+            elif pd.notna(d.get("montant_ttc")):
+                score += 0.1
+            score += 0.3 * _similarite(f["fournisseur"], d.get("fournisseur"))
+            date_d = pd.to_datetime(d.get("date"), errors="coerce")
+            if pd.notna(date_f) and pd.notna(date_d):
+                score += 0.1 * max(0.0, 1 - abs((date_d - date_f).days) / FENETRE_JOURS)
+            if i == piece:
+                score += 0.2
+            if score >= SCORE_MIN:
+                scores.append((score, i))
+
+        for rang, (score, i) in enumerate(sorted(scores, reverse=True)[:NB_PROPOSITIONS], start=1):
+            d = depenses[i]
+            propositions.append({
+                "fichier": f["fichier"],
+                "piece_facture": f["piece_id"],
+                "montant_facture": f["montant_ttc"],
+                "date_facture": f["date"],
+                "rang": rang,
+                "score": round(score, 3),
+                "depense_id": d.get("depense_id"),
+                "piece_depense": d.get("piece_id"),
+                "fournisseur": d.get("fournisseur"),
+                "montant_depense": d.get("montant_ttc"),
+                "date_depense": d.get("date"),
+            })
+
+        if not scores:
+            propositions.append({
+                "fichier": f["fichier"],
+                "piece_facture": f["piece_id"],
+                "montant_facture": f["montant_ttc"],
+                "date_facture": f["date"],
+                "rang": None,
+                "score": 0.0,
+            })
+
+    return pd.DataFrame(propositions)
+
+
+# =========================================================
+# CHARGEMENT DES DÉPENSES
+# =========================================================
+def charger_depenses_csv(chemin, annee):
+    df = pd.read_csv(chemin, encoding="utf-8-sig")
+    df = df[df["annee"] == annee].copy()
+    df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
+    if "depense_id" not in df.columns:
+        df["depense_id"] = None
+    return df
+
+
+def charger_depenses_supabase(annee, immeuble=None):
+    import donnees
+    from immeubles import pour_immeuble
+    from supabase_client import get_supabase_env
+
+    supabase = get_supabase_env()
+    if immeuble is not None:
+        supabase = pour_immeuble(supabase, immeuble)
+    df = donnees.charger_depenses(supabase, annee)
+    if not df.empty:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rapprochement factures PDF ↔ dépenses")
+    parser.add_argument("--annee", type=int, required=True)
+    parser.add_argument("--dossier", default=str(DOSSIER_FACTURES))
+    parser.add_argument("--csv", help="export CSV des dépenses (sinon lecture Supabase)")
+    parser.add_argument("--immeuble", type=int, help="identifiant de l'immeuble (lecture Supabase)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sortie", help="fichier .csv ou .json (sinon sortie standard)")
+    args = parser.parse_args(argv)
+
+    fichiers = lister_factures(args.dossier, args.annee)
+    df_factures = extraire_factures(fichiers, args.workers)
+
+    if args.csv:
+        df_dep = charger_depenses_csv(args.csv, args.annee)
+    else:
+        df_dep = charger_depenses_supabase(args.annee, args.immeuble)
+
+    resultat = rapprocher(df_factures, df_dep)
+
+    if args.sortie and args.sortie.endswith(".json"):
+        resultat.to_json(args.sortie, orient="records", force_ascii=False, date_format="iso")
+    else:
+        resultat.to_csv(args.sortie or sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    main()
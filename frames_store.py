@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Les vues renvoyées aux sessions sont des copies superficielles :
+# avec le copy-on-write de pandas, une session qui modifie sa vue
+# déclenche la copie des seules colonnes touchées, jamais du frame partagé.
+pd.set_option("mode.copy_on_write", True)
+
+CAPACITE_MO = int(os.environ.get("IMMEUBLE_CACHE_MO", "256"))
+# filet de sécurité : les écritures sont propagées par le bus d'invalidation
+TTL = float(os.environ.get("IMMEUBLE_CACHE_TTL", "3600"))     # secondes, 0 = sans limite
+
+
+class MagasinFrames:
+    """
+    Magasin de DataFrames en lecture seule, partagé par toutes les sessions du process,
+    borné en mémoire avec éviction LRU.
+
+    Une entrée invalidée ou expirée n'est plus servie, mais reste en place (en tête
+    d'éviction) comme repli quand le backend est indisponible : le dernier frame
+    valide n'existe qu'une fois, sous la même capacité.
+    """
+
+    def __init__(self, capacite_octets, ttl=0):
+        self.capacite_octets = capacite_octets
+        self.ttl = ttl
+        self._frames = OrderedDict()   # cle -> (df, taille, charge_le, ttl propre ou None, valide)
+        self._octets = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _valide(self, entree):
+        if entree is None or not entree[4]:
+            return False
+        ttl = entree[3] if entree[3] is not None else self.ttl
+        return not (ttl and time.time() - entree[2] > ttl)
+
+    # ---------- Lecture
+    def lire(self, cle):
+        """Vue du frame `cle` s'il est valide, sinon None."""
+        with self._lock:
+            entree = self._frames.get(cle)
+            if self._valide(entree):
+                self._frames.move_to_end(cle)
+                self.hits += 1
+                return entree[0].copy(deep=False)
+            self.misses += 1
+            return None
+
+    def obtenir(self, cle, chargeur):
+        """Retourne une vue du frame `cle`, chargé via `chargeur()` s'il est absent."""
+        df = self.lire(cle)
+        if df is not None:
+            return df
+
+        df = chargeur()
+        self.deposer(cle, df)
+        return df.copy(deep=False)
+
+    def contient(self, cle):
+        with self._lock:
+            return self._valide(self._frames.get(cle))
+
+    def cles(self):
+        with self._lock:
+            return list(self._frames)
+
+    def charge_le(self, cle):
+        """Date de chargement du frame valide `cle`, None s'il n'est pas servi."""
+        with self._lock:
+            entree = self._frames.get(cle)
+            return entree[2] if self._valide(entree) else None
+
+    def repli(self, cle):
+        """(vue, charge_le) du dernier frame déposé sous `cle`, même invalidé ; None sinon."""
+        with self._lock:
+            entree = self._frames.get(cle)
+            return None if entree is None else (entree[0].copy(deep=False), entree[2])
+
+    # ---------- Écriture
+    def deposer(self, cle, df, ttl=None):
+        """`ttl` : durée de vie propre à l'entrée (ex. résultat négatif), sinon celle du magasin."""
+        taille = int(df.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            ancien = self._frames.pop(cle, None)
+            if ancien is not None:
+                self._octets -= ancien[1]
+
+            self._frames[cle] = (df, taille, time.time(), ttl, True)
+            self._octets += taille
+
+            # on garde toujours au moins le dernier frame déposé
+            while self._octets > self.capacite_octets and len(self._frames) > 1:
+                _, (_, taille_evincee, _, _, _) = self._frames.popitem(last=False)
+                self._octets -= taille_evincee
+                self.evictions += 1
+
+    def invalider(self, predicat):
+        """Les entrées dont la clé satisfait `predicat(cle)` ne sont plus servies (gardées pour le repli)."""
+        with self._lock:
+            for cle in [c for c in self._frames if predicat(c)]:
+                self._frames[cle] = self._frames[cle][:4] + (False,)
+                self._frames.move_to_end(cle, last=False)
+
+    def retirer(self, predicat):
+        """Supprime les entrées dont la clé satisfait `predicat(cle)`, repli compris."""
+        with self._lock:
+            for cle in [c for c in self._frames if predicat(c)]:
+                self._octets -= self._frames.pop(cle)[1]
+
+    def vider(self):
+        self.retirer(lambda cle: True)
+
+    # ---------- Diagnostic
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entrees": len(self._frames),
+                "en_repli": sum(not self._valide(e) for e in self._frames.values()),
+                "octets": self._octets,
+                "capacite_octets": self.capacite_octets,
+                "ttl": self.ttl,
+            }
+
+    def entrees(self):
+        with self._lock:
+            return pd.DataFrame([
+                {
+                    "cle": " / ".join(str(c) for c in cle),
+                    "lignes": len(entree[0]),
+                    "octets": entree[1],
+                    "charge_le": pd.Timestamp(entree[2], unit="s"),
+                    "servi": self._valide(entree),
+                }
+                for cle, entree in reversed(self._frames.items())
+            ])
+
+
+magasin = MagasinFrames(CAPACITE_MO * 1024 * 1024, ttl=TTL)
@@ -0,0 +1,102 @@
+"""
+Dimension immeuble : un même déploiement gère plusieurs immeubles.
+
+Les pages reçoivent un client restreint à l'immeuble sélectionné (ClientImmeuble) :
+toute lecture, mise à jour ou suppression sur une table partitionnée est filtrée
+sur immeuble_id, toute insertion le renseigne. Les caches (frames, cubes,
+index, matrice, contrôles) sont rangés par immeuble via immeuble_de(supabase).
+
+Le plan comptable reste commun ; chaque immeuble peut en surcharger des comptes
+(table plan_comptable_immeuble, fusionnée par donnees.charger_plan_comptable).
+"""
+
+COLONNE = "immeuble_id"
+TABLES_PARTITIONNEES = {
+    "depenses",
+    "budgets",
+    "repartition_depenses",
+    "plan_comptable_immeuble",
+    "v_depenses_enrichies",
+    "v_depenses_detail",
+}
+
+
+class TableImmeuble:
+    """Builder de table dont chaque requête est limitée à un immeuble."""
+
+    def __init__(self, table, immeuble_id):
+        self._table = table
+        self.immeuble_id = immeuble_id
+
+    def _avec_immeuble(self, valeurs):
+        if isinstance(valeurs, list):
+            return [{**v, COLONNE: self.immeuble_id} for v in valeurs]
+        return {**valeurs, COLONNE: self.immeuble_id}
+
+    def select(self, *args, **kwargs):
+        return self._table.select(*args, **kwargs).eq(COLONNE, self.immeuble_id)
+
+    def update(self, valeurs, **kwargs):
+        return self._table.update(valeurs, **kwargs).eq(COLONNE, self.immeuble_id)
+
+    def delete(self, **kwargs):
+        return self._table.delete(**kwargs).eq(COLONNE, self.immeuble_id)
+
+    def insert(self, valeurs, **kwargs):
+        return self._table.insert(self._avec_immeuble(valeurs), **kwargs)
+
+
+class ClientImmeuble:
+    """Client supabase (ou backend local) restreint à un immeuble."""
+
+    def __init__(self, client, immeuble_id):
+        self.client = client
+        self.immeuble_id = immeuble_id
+
+    def table(self, nom):
+        table = self.client.table(nom)
+        if nom in TABLES_PARTITIONNEES:
+            return TableImmeuble(table, self.immeuble_id)
+        return table
+
+
+def pour_immeuble(client, immeuble_id):
+    if isinstance(client, ClientImmeuble):
+        client = client.client
+    return ClientImmeuble(client, immeuble_id)
+
+
+def immeuble_de(supabase):
+    """Espace de noms des caches : l'immeuble du client, None pour un client non restreint."""
+    return getattr(supabase, "immeuble_id", None)
+
+
+def commun(supabase):
+    """Client non restreint (tables communes, ex. plan_comptable)."""
+    return getattr(supabase, "client", supabase)
+
+
+def surcharger_plan(plan, surcharges):
+    """
+    Plan comptable d'un immeuble : les valeurs renseignées dans `surcharges`
+    (par compte_8) remplacent celles du plan commun ; un compte absent du plan
+    commun est ajouté.
+    """
+    if surcharges.empty:
+        return plan
+    if plan.empty:
+        return surcharges.drop(columns=[COLONNE], errors="ignore")
+
+    surcharges = (
+        surcharges
+        .drop_duplicates("compte_8", keep="last")
+        .set_index("compte_8")
+        .reindex(columns=plan.columns.drop("compte_8"))
+    )
+    return (
+        surcharges
+        .combine_first(plan.set_index("compte_8"))
+        .reset_index()
+        .reindex(columns=plan.columns)
+        .sort_values(["groupe_compte", "compte_8"], ignore_index=True)
+    )
@@ -0,0 +1,260 @@
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+import donnees
+import resilience
+from immeubles import commun, immeuble_de, pour_immeuble
+
+CHAMPS_TEXTE = ["poste", "fournisseur", "commentaire", "libelle"]
+SEUIL_SIMILARITE = 0.35  # Jaccard minimal sur les trigrammes pour un mot approché
+LIMITE_RESULTATS = 500
+
+
+# =========================================================
+# NORMALISATION
+# =========================================================
+def normaliser(texte):
+    if texte is None or (isinstance(texte, float) and pd.isna(texte)):
+        return ""
+    texte = unicodedata.normalize("NFKD", str(texte).lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", texte).strip()
+
+
+def mots(texte):
+    return normaliser(texte).split()
+
+
+def trigrammes(mot):
+    mot = f"  {mot} "
+    return {mot[i:i + 3] for i in range(len(mot) - 2)}
+
+
+# =========================================================
+# INDEX INVERSÉ
+# =========================================================
+class IndexRecherche:
+    """
+    Index inversé mot → dépenses, doublé d'un index trigramme → mots
+    pour la recherche approchée (fautes de frappe, accents, début de mot).
+    """
+
+    def __init__(self):
+        self.documents = {}                    # depense_id -> ligne résumée
+        self._mots_doc = {}                    # depense_id -> set(mots)
+        self._postings = defaultdict(set)      # mot -> set(depense_id)
+        self._trigrammes = defaultdict(set)    # trigramme -> set(mots)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    # ---------- Mise à jour
+    def ajouter(self, depense_id, ligne, libelle=None):
+        valeurs = {c: ligne.get(c) for c in CHAMPS_TEXTE}
+        if libelle is not None:
+            valeurs["libelle"] = libelle
+
+        vocabulaire = set()
+        for valeur in valeurs.values():
+            vocabulaire.update(mots(valeur))
+
+        with self._lock:
+            self.retirer(depense_id)
+            self.documents[depense_id] = {
+                "depense_id": depense_id,
+                "annee": ligne.get("annee"),
+                "date": ligne.get("date"),
+                "compte": ligne.get("compte"),
+                "poste": ligne.get("poste"),
+                "fournisseur": ligne.get("fournisseur"),
+                "montant_ttc": ligne.get("montant_ttc"),
+                "commentaire": ligne.get("commentaire"),
+            }
+            self._mots_doc[depense_id] = vocabulaire
+            for mot in vocabulaire:
+                if mot not in self._postings:
+                    for tri in trigrammes(mot):
+                        self._trigrammes[tri].add(mot)
+                self._postings[mot].add(depense_id)
+
+    def retirer(self, depense_id):
+        with self._lock:
+            self.documents.pop(depense_id, None)
+            for mot in self._mots_doc.pop(depense_id, ()):
+                docs = self._postings[mot]
+                docs.discard(depense_id)
+                if not docs:
+                    del self._postings[mot]
+                    for tri in trigrammes(mot):
+                        self._trigrammes[tri].discard(mot)
+
+    def relibeller(self, libelles):
+        """Libellés de comptes modifiés {compte: libellé} : seules leurs dépenses sont réindexées."""
+        with self._lock:
+            ids = [i for i, d in self.documents.items() if str(d.get("compte")) in libelles]
+            for depense_id in ids:
+                ligne = dict(self.documents[depense_id])
+                self.ajouter(depense_id, ligne, libelles[str(ligne["compte"])])
+        return len(ids)
+
+    # ---------- Recherche
+    def _mots_proches(self, mot):
+        """Mots du vocabulaire proches de `mot`, avec leur score (0–1)."""
+        if mot in self._postings:
+            proches = {mot: 1.0}
+        else:
+            proches = {}
+
+        tri_mot = trigrammes(mot)
+        candidats = defaultdict(int)
+        for tri in tri_mot:
+            for m in self._trigrammes.get(tri, ()):
+                candidats[m] += 1
+
+        for m, communs in candidats.items():
+            if m in proches:
+                continue
+            if m.startswith(mot):
+                proches[m] = 0.9
+                continue
+            jaccard = communs / (len(tri_mot) + len(trigrammes(m)) - communs)
+            if jaccard >= SEUIL_SIMILARITE:
+                proches[m] = jaccard
+
+        return proches
+
+    def rechercher(self, requete, annee=None, limite=LIMITE_RESULTATS):
+        """
+        Retourne les depense_id correspondant à tous les mots de la requête,
+        triés par pertinence décroissante ; `annee` est filtrée avant la limite,
+        `limite=None` renvoie toutes les correspondances.
+        """
+        termes = mots(requete)
+        if not termes:
+            return []
+
+        with self._lock:
+            scores = None
+            for terme in termes:
+                score_terme = defaultdict(float)
+                for mot, score in self._mots_proches(terme).items():
+                    for doc in self._postings[mot]:
+                        score_terme[doc] = max(score_terme[doc], score)
+
+                if scores is None:
+                    scores = dict(score_terme)
+                else:
+                    scores = {
+                        doc: s + score_terme[doc]
+                        for doc, s in scores.items()
+                        if doc in score_terme
+                    }
+                if not scores:
+                    return []
+
+            if annee is not None:
+                scores = {
+                    doc: s for doc, s in scores.items()
+                    if self.documents[doc]["annee"] == annee
+                }
+
+        return sorted(scores, key=scores.get, reverse=True)[:limite]
+
+    def resultats(self, depense_ids):
+        with self._lock:
+            return pd.DataFrame([self.documents[i] for i in depense_ids if i in self.documents])
+
+
+# =========================================================
+# INDEX PARTAGÉS (TOUTES ANNÉES, UN PAR IMMEUBLE, POUR TOUT LE PROCESS)
+# =========================================================
+_INDEX = {}                     # immeuble -> IndexRecherche
+_LIBELLES = {}                  # immeuble -> {compte: libellé}
+_LOCK = threading.Lock()
+
+
+def get_index(supabase):
+    immeuble = immeuble_de(supabase)
+    with _LOCK:
+        index = _INDEX.get(immeuble)
+    if index is not None:
+        return index
+
+    # toutes les années : même frame que le contrôle des doublons (magasin partagé)
+    df = donnees.charger_depenses_toutes_annees(supabase).reindex(
+        columns=["depense_id", "annee", "date", "compte", "poste", "fournisseur", "montant_ttc", "commentaire"]
+    )
+    # plan commun surchargé par l'immeuble
+    plan = donnees.charger_plan_comptable(supabase).reindex(columns=["compte_8", "libelle"])
+    libelles = dict(zip(plan["compte_8"].astype(str), plan["libelle"]))
+
+    index = IndexRecherche()
+    for ligne in df.astype(object).where(df.notna(), None).to_dict("records"):
+        index.ajouter(ligne["depense_id"], ligne, libelles.get(str(ligne.get("compte"))))
+
+    # construit sur un résultat de repli : servi mais pas conservé
+    if resilience.est_perimee(("depenses", immeuble)):
+        return index
+    with _LOCK:
+        if immeuble not in _INDEX:
+            _INDEX[immeuble] = index
+            _LIBELLES[immeuble] = libelles
+        return _INDEX[immeuble]
+
+
+def notifier_depense(ancienne=None, nouvelle=None, immeuble=None):
+    """
+    À appeler après chaque écriture sur depenses (sans effet si l'index n'est pas construit).
+    L'index non restreint (tous immeubles) reçoit la même mise à jour.
+    """
+    for i in {immeuble, None}:
+        index = _INDEX.get(i)
+        if index is None:
+            continue
+
+        if ancienne is not None and ancienne.get("depense_id") is not None:
+            index.retirer(ancienne["depense_id"])
+        if nouvelle is not None and nouvelle.get("depense_id") is not None:
+            index.ajouter(
+                nouvelle["depense_id"],
+                nouvelle,
+                _LIBELLES.get(i, {}).get(str(nouvelle.get("compte")))
+            )
+
+
+def notifier_plan(supabase, comptes):
+    """
+    Après une modification du plan comptable portant sur `comptes` : les index
+    déjà construits de l'immeuble du client (tous pour un client non restreint)
+    relisent leurs libellés et réindexent les seules dépenses de ces comptes.
+    """
+    immeuble = immeuble_de(supabase)
+    comptes = [str(c) for c in comptes]
+    with _LOCK:
+        cibles = [(i, index) for i, index in _INDEX.items() if immeuble is None or i in (immeuble, None)]
+
+    for i, index in cibles:
+        client = commun(supabase) if i is None else pour_immeuble(supabase, i)
+        plan = donnees.charger_plan_comptable(client).reindex(columns=["compte_8", "libelle"])
+        libelles = dict(zip(plan["compte_8"].astype(str), plan["libelle"]))
+        modifies = {c: libelles.get(c) for c in comptes}
+        _LIBELLES.setdefault(i, {}).update(modifies)
+        index.relibeller(modifies)
+
+
+def oublier(immeuble=None):
+    """
+    Force la reconstruction au prochain accès (modification faite par un autre process) ;
+    tous les immeubles si `immeuble` est None.
+    """
+    with _LOCK:
+        if immeuble is None:
+            _INDEX.clear()
+        else:
+            _INDEX.pop(immeuble, None)
+            _INDEX.pop(None, None)
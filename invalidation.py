@@ -0,0 +1,220 @@
+"""
+Bus d'invalidation entre sessions et entre process.
+
+Chaque écriture incrémente un compteur de version par (table, immeuble, année) ;
+au début de chaque rerun, verifier() compare les versions publiées à celles
+déjà appliquées par le process et purge les caches concernés
+(magasin de frames, cubes, index de recherche,
+matrice de répartition).
+
+Canal : fichier JSON local partagé par les process de la machine
+(IMMEUBLE_FICHIER_VERSIONS), repli en mémoire du process s'il est inaccessible.
+Une vérification coûte un os.stat ; le fichier n'est relu que s'il a changé.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:         # Windows : incréments non verrouillés entre process
+    fcntl = None
+
+FICHIER_VERSIONS = Path(os.environ.get("IMMEUBLE_FICHIER_VERSIONS", ".cache/versions.json"))
+TOUTES = "*"
+
+
+def _partie(valeur):
+    return TOUTES if valeur is None else valeur
+
+
+def _valeur(partie):
+    if partie == TOUTES:
+        return None
+    return int(partie) if partie.lstrip("-").isdigit() else partie
+
+
+def _cle(table, annee, immeuble=None):
+    return f"{table}:{_partie(immeuble)}:{_partie(annee)}"
+
+
+def _table_annee_immeuble(cle):
+    """Clé -> (table, année, immeuble) ; les clés « table:année » antérieures valent pour tous les immeubles."""
+    parties = cle.split(":")
+    if len(parties) == 2:
+        table, annee = parties
+        return table, _valeur(annee), None
+    table, immeuble, annee = parties
+    return table, _valeur(annee), _valeur(immeuble)
+
+
+# =========================================================
+# CANAUX
+# =========================================================
+class CanalMemoire:
+    nom = "mémoire du process"
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def incrementer(self, cle):
+        with self._lock:
+            self._versions[cle] = self._versions.get(cle, 0) + 1
+            return self._versions[cle]
+
+    def lire(self):
+        with self._lock:
+            return dict(self._versions)
+
+
+class CanalFichier:
+    nom = "fichier local"
+
+    def __init__(self, chemin):
+        self.chemin = Path(chemin)
+        self._signature = None
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _charger(self):
+        try:
+            return json.loads(self.chemin.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def incrementer(self, cle):
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.chemin.with_suffix(".lock"), "w") as verrou:
+            if fcntl is not None:
+                fcntl.flock(verrou, fcntl.LOCK_EX)
+
+            versions = self._charger()
+            versions[cle] = versions.get(cle, 0) + 1
+
+            # remplacement atomique : un lecteur voit l'ancien ou le nouveau fichier
+            temporaire = self.chemin.with_suffix(f".{os.getpid()}.tmp")
+            temporaire.write_text(json.dumps(versions))
+            os.replace(temporaire, self.chemin)
+
+        return versions[cle]
+
+    def lire(self):
+        try:
+            st = os.stat(self.chemin)
+        except FileNotFoundError:
+            return {}
+
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            if signature != self._signature:
+                self._versions = self._charger()
+                self._signature = signature
+            return self._versions
+
+
+# =========================================================
+# ÉTAT DU PROCESS
+# =========================================================
+_canal = CanalFichier(FICHIER_VERSIONS)
+_vues = None                    # cle -> dernière version appliquée par ce process
+_lock = threading.Lock()
+
+compteurs = {"verifications": 0, "publications": 0, "invalidations": 0}
+
+
+def _basculer_en_memoire():
+    global _canal
+    if not isinstance(_canal, CanalMemoire):
+        _canal = CanalMemoire()
+
+
+def publier(table, annee=None, immeuble=None):
+    """À appeler après une écriture déjà répercutée sur les caches de ce process."""
+    global _vues
+    cle = _cle(table, annee, immeuble)
+    try:
+        version = _canal.incrementer(cle)
+    except (OSError, ValueError):
+        _basculer_en_memoire()
+        version = _canal.incrementer(cle)
+
+    with _lock:
+        compteurs["publications"] += 1
+        _vues = _vues or {}
+        # version suivante de la nôtre : rien d'autre à rattraper.
+        # Sinon un autre process a écrit entre-temps : verifier() purgera.
+        if _vues.get(cle, 0) == version - 1:
+            _vues[cle] = version
+
+
+def _lire_canal():
+    try:
+        return _canal.lire()
+    except (OSError, ValueError):
+        _basculer_en_memoire()
+        return _canal.lire()
+
+
+def versions():
+    """Versions publiées sur le canal : {(table, annee, immeuble): version}."""
+    return {_table_annee_immeuble(cle): version for cle, version in _lire_canal().items()}
+
+
+def verifier():
+    """Début de rerun : purge les caches des (table, immeuble, année) modifiés ailleurs."""
+    global _vues
+    versions = _lire_canal()
+
+    with _lock:
+        compteurs["verifications"] += 1
+        if _vues is None:
+            # démarrage du process : caches vides, rien à purger
+            _vues = dict(versions)
+            return []
+
+        modifiees = [cle for cle, version in versions.items() if version > _vues.get(cle, 0)]
+        for cle in modifiees:
+            _vues[cle] = versions[cle]
+        compteurs["invalidations"] += len(modifiees)
+
+    for cle in modifiees:
+        appliquer(*_table_annee_immeuble(cle))
+    return modifiees
+
+
+def appliquer(table, annee=None, immeuble=None):
+    """Purge locale de tous les caches dérivés de `table` (sans republier)."""
+    import donnees
+
+    donnees.purger(table, annee, immeuble)
+    oublier_agregats(table, annee, immeuble)
+
+
+def oublier_agregats(table, annee=None, immeuble=None):
+    """
+    Agrégats construits à partir de `table` (cubes, index, contrôles, matrice),
+    pour `immeuble` et les agrégats non restreints, ou tous les immeubles si None.
+    """
+    import cube
+    import doublons
+    import index_recherche
+    import repartition
+
+    if table == "depenses":
+        doublons.oublier(immeuble)
+    if table in ("depenses", "plan_comptable", "plan_comptable_immeuble"):
+        index_recherche.oublier(immeuble)
+        cube.oublier(annee if table == "depenses" else None, immeuble)
+    if table == "repartition_depenses":
+        repartition.oublier(immeuble)
+
+
+def etat():
+    with _lock:
+        return {
+            "canal": _canal.nom,
+            "versions": dict(_vues or {}),
+            **compteurs,
+        }
@@ -2,30 +2,48 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
+import cube
+import donnees
+import index_recherche
+import rapports
+from immeubles import commun, immeuble_de
+
+GROUPES_CHARGES = {
+    1: "1 – Charges communes générales",
+    2: "2 – Charges RDC / sous-sols",
+    3: "3 – Charges sous-sols",
+    4: "4 – Ascenseurs",
+    5: "5 – Monte-voitures"
+}
+
+
+def notifier_plan(supabase, comptes):
+    """Après une écriture sur le plan : seuls les agrégats de `comptes` sont mis à jour."""
+    cube.reclasser(supabase, comptes)
+    index_recherche.notifier_plan(supabase, comptes)
+
+
 # =========================
 # PLAN COMPTABLE UI
 # =========================
-def plan_comptable_ui(supabase):
+def plan_comptable_ui(supabase, annee):
 
     st.header("📘 Plan comptable – Groupes de charges")
 
     # =========================
     # CHARGEMENT
     # =========================
-    res = (
-        supabase
-        .table("plan_comptable")
-        .select("*")
-        .order("groupe_compte")
-        .order("compte_8")
-        .execute()
-    )
+    immeuble = immeuble_de(supabase)
+    df = donnees.charger_plan_comptable(supabase)
 
-    if not res.data:
+    if df.empty:
         st.info("Plan comptable vide")
         return
 
-    df = pd.DataFrame(res.data)
+    # comptes surchargés pour l'immeuble sélectionné
+    surcharges = donnees.charger_surcharges_plan(supabase) if immeuble is not None else pd.DataFrame()
+    surcharges_comptes = set(surcharges["compte_8"]) if not surcharges.empty else set()
+    df["surcharge_immeuble"] = df["compte_8"].isin(surcharges_comptes)
 
     # Sécurité colonnes
     for col in ["libelle", "libelle_groupe", "groupe_charges"]:
@@ -41,7 +59,8 @@ def plan_comptable_ui(supabase):
             "libelle",
             "groupe_compte",
             "libelle_groupe",
-            "groupe_charges"
+            "groupe_charges",
+            "surcharge_immeuble"
         ]],
         use_container_width=True,
         hide_index=True
@@ -65,27 +84,23 @@ def plan_comptable_ui(supabase):
 
             groupe_charges = c5.selectbox(
                 "Groupe de charges",
-                [1, 2, 3, 4, 5],
-                format_func=lambda x: {
-                    1: "1 – Charges communes générales",
-                    2: "2 – Charges RDC / sous-sols",
-                    3: "3 – Charges sous-sols",
-                    4: "4 – Ascenseurs",
-                    5: "5 – Monte-voitures"
-                }[x]
+                list(GROUPES_CHARGES),
+                format_func=GROUPES_CHARGES.get
             )
 
             submit_add = st.form_submit_button("➕ Ajouter")
 
         if submit_add:
-            supabase.table("plan_comptable").insert({
+            donnees.ecrire(supabase.table("plan_comptable").insert({
                 "compte_8": compte_8,
                 "libelle": libelle,
                 "groupe_compte": groupe_compte,
                 "libelle_groupe": libelle_groupe,
                 "groupe_charges": groupe_charges
-            }).execute()
+            }), "plan_comptable")
 
+            donnees.invalider("plan_comptable")
+            notifier_plan(commun(supabase), [compte_8])
             st.success("Compte ajouté")
             st.rerun()
 
@@ -117,36 +132,227 @@ def plan_comptable_ui(supabase):
 
         e_groupe_charges = st.selectbox(
             "Groupe de charges",
-            [1, 2, 3, 4, 5],
-            index=[1, 2, 3, 4, 5].index(int(gc)),
-            format_func=lambda x: {
-                1: "1 – Charges communes générales",
-                2: "2 – Charges RDC / sous-sols",
-                3: "3 – Charges sous-sols",
-                4: "4 – Ascenseurs",
-                5: "5 – Monte-voitures"
-            }[x]
+            list(GROUPES_CHARGES),
+            index=list(GROUPES_CHARGES).index(int(gc)),
+            format_func=GROUPES_CHARGES.get
+        )
+
+        # surcharge : n'affecte que l'immeuble sélectionné, le plan commun est inchangé
+        e_surcharge = st.checkbox(
+            "Propre à cet immeuble (surcharge du plan commun)",
+            value=selected in surcharges_comptes,
+            disabled=immeuble is None,
+            key=f"edit_surcharge_{selected}"
         )
 
         col_a, col_b = st.columns(2)
         submit_edit = col_a.form_submit_button("💾 Enregistrer")
-        submit_delete = col_b.form_submit_button("🗑️ Supprimer")
+        submit_delete = col_b.form_submit_button(
+            "↩️ Revenir au plan commun" if e_surcharge else "🗑️ Supprimer"
+        )
+
+    valeurs = {
+        "libelle": e_libelle,
+        "groupe_compte": e_groupe_compte,
+        "libelle_groupe": e_libelle_groupe,
+        "groupe_charges": e_groupe_charges
+    }
 
-    if submit_edit:
-        supabase.table("plan_comptable").update({
-            "libelle": e_libelle,
-            "groupe_compte": e_groupe_compte,
-            "libelle_groupe": e_libelle_groupe,
-            "groupe_charges": e_groupe_charges
-        }).eq("compte_8", selected).execute()
+    if submit_edit and e_surcharge:
+        if selected in surcharges_comptes:
+            donnees.ecrire(supabase.table("plan_comptable_immeuble").update(valeurs).eq(
+                "compte_8", selected
+            ), "plan_comptable_immeuble", immeuble=immeuble)
+        else:
+            donnees.ecrire(supabase.table("plan_comptable_immeuble").insert({
+                "compte_8": selected, **valeurs
+            }), "plan_comptable_immeuble", immeuble=immeuble)
 
+        donnees.invalider("plan_comptable_immeuble", immeuble=immeuble)
+        notifier_plan(supabase, [selected])
+        st.success("Surcharge enregistrée pour cet immeuble")
+        st.rerun()
+
+    elif submit_edit:
+        donnees.ecrire(
+            supabase.table("plan_comptable").update(valeurs).eq("compte_8", selected),
+            "plan_comptable"
+        )
+
+        donnees.invalider("plan_comptable")
+        notifier_plan(commun(supabase), [selected])
         st.success("Compte mis à jour")
         st.rerun()
 
-    if submit_delete:
-        supabase.table("plan_comptable").delete().eq(
+    if submit_delete and e_surcharge:
+        donnees.ecrire(supabase.table("plan_comptable_immeuble").delete().eq(
+            "compte_8", selected
+        ), "plan_comptable_immeuble", immeuble=immeuble)
+
+        donnees.invalider("plan_comptable_immeuble", immeuble=immeuble)
+        notifier_plan(supabase, [selected])
+        st.warning("Surcharge supprimée")
+        st.rerun()
+
+    elif submit_delete:
+        donnees.ecrire(supabase.table("plan_comptable").delete().eq(
             "compte_8", selected
-        ).execute()
+        ), "plan_comptable")
 
+        donnees.invalider("plan_comptable")
+        notifier_plan(commun(supabase), [selected])
         st.warning("Compte supprimé")
         st.rerun()
+
+    st.divider()
+
+    reclassement_masse(supabase, annee, df, surcharges)
+
+
+# =========================
+# RECLASSEMENT EN MASSE
+# =========================
+# Fragment : sélection et aperçu se recalculent sans relancer la page ;
+# l'application déclenche st.rerun() qui relance toute la page.
+@st.fragment
+def reclassement_masse(supabase, annee, df, surcharges):
+    st.markdown("### 🔀 Reclassement en masse")
+
+    immeuble = immeuble_de(supabase)
+    surcharges_comptes = set(surcharges["compte_8"]) if not surcharges.empty else set()
+    libelles = dict(zip(df["compte_8"], df["libelle"]))
+
+    mode = st.radio(
+        "Sélection des comptes",
+        ["Liste", "Préfixe"],
+        horizontal=True,
+        key="reclassement_mode"
+    )
+
+    if mode == "Liste":
+        comptes = st.multiselect(
+            "Comptes",
+            df["compte_8"].tolist(),
+            format_func=lambda c: f"{c} – {libelles.get(c) or ''}",
+            key="reclassement_comptes"
+        )
+    else:
+        prefixe = st.text_input("Préfixe de compte (ex : 6015)", key="reclassement_prefixe").strip()
+        comptes = df.loc[df["compte_8"].astype(str).str.startswith(prefixe), "compte_8"].tolist() if prefixe else []
+        if prefixe:
+            st.caption(f"{len(comptes)} compte(s) commençant par {prefixe}")
+
+    c1, c2, c3 = st.columns(3)
+    nouveau_groupe_charges = c1.selectbox(
+        "Nouveau groupe de charges",
+        [None] + list(GROUPES_CHARGES),
+        format_func=lambda x: "Inchangé" if x is None else GROUPES_CHARGES[x],
+        key="reclassement_groupe_charges"
+    )
+    nouveau_groupe_compte = c2.text_input(
+        "Nouveau groupe comptable (vide : inchangé)",
+        key="reclassement_groupe_compte"
+    ).strip() or None
+    pour_immeuble = c3.checkbox(
+        "Pour cet immeuble uniquement (surcharges)",
+        disabled=immeuble is None,
+        key="reclassement_surcharge"
+    )
+
+    if not comptes or (nouveau_groupe_charges is None and nouveau_groupe_compte is None):
+        st.caption("Choisir des comptes et au moins un nouveau groupe pour voir l'impact.")
+        return
+
+    # ======================================================
+    # APERÇU DE L'IMPACT (CUBE DE L'ANNÉE, AUCUNE ÉCRITURE)
+    # ======================================================
+    # plan commun modifié : les valeurs surchargées par l'immeuble restent en place
+    fixes = {}
+    if not pour_immeuble and not surcharges.empty:
+        for champ, valeur in [("groupe_compte", nouveau_groupe_compte), ("groupe_charges", nouveau_groupe_charges)]:
+            if valeur is not None and champ in surcharges.columns:
+                fixes[champ] = set(surcharges.loc[surcharges[champ].notna(), "compte_8"]) & set(comptes)
+    inchanges = [
+        c for c in comptes
+        if all(c in fixes.get(champ, ()) for champ, valeur in [
+            ("groupe_compte", nouveau_groupe_compte), ("groupe_charges", nouveau_groupe_charges)
+        ] if valeur is not None)
+    ]
+
+    cube_annee = cube.get_cube(supabase, annee)
+    impact = rapports.impact_reclassement(
+        cube_annee.agreger(["compte", "groupe_compte", "groupe_charges"]),
+        donnees.charger_budgets(supabase, annee),
+        comptes,
+        groupe_compte=nouveau_groupe_compte,
+        groupe_charges=nouveau_groupe_charges,
+        surcharges=fixes
+    )
+
+    if not pour_immeuble:
+        st.info(
+            "Le plan commun est modifié pour tous les immeubles ; l'aperçu ne porte que sur "
+            + ("l'immeuble sélectionné." if immeuble is not None else "les dépenses non restreintes.")
+        )
+    if any(fixes.values()):
+        st.warning(
+            "Surcharges de cet immeuble conservées (valeur inchangée ici) : "
+            + " · ".join(f"{champ} : {', '.join(sorted(map(str, c)))}" for champ, c in fixes.items() if c)
+        )
+
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Comptes reclassés", len(comptes) - len(inchanges))
+    k2.metric(f"Dépenses {annee} déplacées", f"{impact['kpi']['montant']:,.2f} €")
+    k3.metric("Groupes de compte touchés", len(impact["groupe_compte"]))
+
+    if not impact["groupe_compte"].empty:
+        st.markdown(f"**Budget vs réel {annee} par groupe de compte (avant → après)**")
+        st.dataframe(impact["groupe_compte"], use_container_width=True, hide_index=True)
+    if not impact["groupe_charges"].empty:
+        st.markdown(f"**Réel {annee} par groupe de charges (avant → après)**")
+        st.dataframe(impact["groupe_charges"], use_container_width=True, hide_index=True)
+    if impact["groupe_compte"].empty and impact["groupe_charges"].empty:
+        st.info(f"Aucun montant {annee} ne change de groupe.")
+
+    # ======================================================
+    # APPLICATION : UNE ÉCRITURE GROUPÉE
+    # ======================================================
+    valeurs = {
+        k: v for k, v in {
+            "groupe_compte": nouveau_groupe_compte,
+            "groupe_charges": nouveau_groupe_charges,
+        }.items() if v is not None
+    }
+
+    if not st.button(f"✅ Appliquer le reclassement ({len(comptes)} compte(s))", key="reclassement_appliquer"):
+        return
+
+    if pour_immeuble:
+        existants = [c for c in comptes if c in surcharges_comptes]
+        nouveaux = [c for c in comptes if c not in surcharges_comptes]
+        if existants:
+            donnees.ecrire(supabase.table("plan_comptable_immeuble").update(valeurs).in_(
+                "compte_8", existants
+            ), "plan_comptable_immeuble", immeuble=immeuble)
+        if nouveaux:
+            donnees.ecrire(supabase.table("plan_comptable_immeuble").insert(
+                [{"compte_8": c, **valeurs} for c in nouveaux]
+            ), "plan_comptable_immeuble", immeuble=immeuble)
+        donnees.invalider("plan_comptable_immeuble", immeuble=immeuble)
+        notifier_plan(supabase, comptes)
+    else:
+        donnees.ecrire(
+            supabase.table("plan_comptable").update(valeurs).in_("compte_8", comptes),
+            "plan_comptable"
+        )
+        donnees.invalider("plan_comptable")
+        notifier_plan(commun(supabase), comptes)
+
+    if pour_immeuble:
+        st.success(f"{len(comptes)} compte(s) reclassé(s) pour cet immeuble")
+    else:
+        st.success(
+            f"{len(comptes)} compte(s) reclassé(s) dans le plan commun (tous les immeubles)"
+            + (f", dont {len(inchanges)} inchangé(s) ici (surcharges)" if inchanges else "")
+        )
+    st.rerun()
@@ -0,0 +1,194 @@
+"""
+Préchauffage des caches au démarrage du serveur, puis rafraîchissement périodique.
+
+Un thread du process charge, pour chaque immeuble, les frames de l'année par défaut
+(depenses, plan_comptable, budgets, repartition_depenses)
+et construit les agrégats (cube, index, matrice, contrôle des doublons)
+avant l'arrivée de la première session.
+
+Toutes les IMMEUBLE_RAFRAICHISSEMENT secondes, les frames sont relus et remplacés
+sans passer par un cache vide ; les agrégats ne sont reconstruits que si leur
+source a changé. Lancé par serveur.py avant le démarrage de Streamlit,
+ou par app.py au premier rerun (sans effet s'il tourne déjà).
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+
+import cube
+import donnees
+import doublons
+import index_recherche
+import invalidation
+import repartition
+from immeubles import pour_immeuble
+
+ANNEE_DEFAUT = int(os.environ.get("IMMEUBLE_ANNEE_DEFAUT", "2025"))
+PERIODE = float(os.environ.get("IMMEUBLE_RAFRAICHISSEMENT", "300"))     # secondes, 0 = jamais
+
+# (étape, table source, chargement forcé du frame)
+FRAMES = [
+    ("depenses", "depenses", lambda s, a: donnees.charger_depenses(s, a, forcer=True)),
+    ("plan_comptable", "plan_comptable", lambda s, a: donnees.charger_plan_comptable(s, forcer=True)),
+    ("budgets", "budgets", lambda s, a: donnees.charger_budgets(s, a, forcer=True)),
+    ("repartition_depenses", "repartition_depenses", lambda s, a: donnees.charger_repartition(s, forcer=True)),
+]
+
+AGREGATS = [
+    ("cube", lambda s, a: cube.get_cube(s, a)),
+    ("index de recherche", lambda s, a: index_recherche.get_index(s)),
+    ("matrice de répartition", lambda s, a: repartition.get_matrice(s)),
+    ("contrôle des doublons", lambda s, a: doublons.get_rapport(s, a)),
+]
+
+
+class Prechauffage(threading.Thread):
+    def __init__(self, supabase, annee=ANNEE_DEFAUT, periode=PERIODE):
+        super().__init__(daemon=True, name="prechauffage")
+        self.supabase = supabase
+        self.annee = annee
+        self.periode = periode
+        self.statut = "en attente"
+        self.cycles = 0
+        self.dernier_cycle = None           # (fin, durée en s)
+        self.immeubles = [None]             # None : client non restreint
+        self.etapes = {}                    # (immeuble, étape) -> {statut, duree_ms, le, erreur}
+        self._empreintes = {}
+        self._versions = {}                 # immeuble -> versions du bus au cycle précédent
+        self._arret = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---------- Étapes
+    def _etape(self, immeuble, nom, fonction):
+        cle = (immeuble, nom)
+        with self._lock:
+            self.etapes[cle] = {
+                "immeuble": immeuble, "etape": nom, "statut": "en cours",
+                "duree_ms": None, "le": None, "erreur": None,
+            }
+
+        client = self.supabase if immeuble is None else pour_immeuble(self.supabase, immeuble)
+        debut = time.perf_counter()
+        try:
+            resultat = fonction(client, self.annee)
+            statut, erreur = "ok", None
+        except Exception as e:
+            resultat, statut, erreur = None, "erreur", str(e)
+
+        with self._lock:
+            self.etapes[cle].update(
+                statut=statut,
+                duree_ms=(time.perf_counter() - debut) * 1000,
+                le=time.time(),
+                erreur=erreur,
+            )
+        return resultat
+
+    def _immeubles(self):
+        try:
+            df = donnees.charger_immeubles(self.supabase, forcer=True)
+        except Exception:
+            return self.immeubles
+        return df["id"].tolist() if not df.empty else [None]
+
+    def _publiees(self, immeuble):
+        """
+        Tables de frames dont une écriture (de l'application, ce process ou un autre)
+        a été publiée sur le bus depuis le cycle précédent pour `immeuble` et l'année :
+        leurs agrégats ont déjà été mis à jour par deltas ou purgés par verifier().
+        """
+        versions = invalidation.versions()
+        precedentes = self._versions.get(immeuble)
+        self._versions[immeuble] = versions
+        if precedentes is None:
+            return set()
+
+        tables = set()
+        for (table, annee, i), version in versions.items():
+            if version <= precedentes.get((table, annee, i), 0):
+                continue
+            if (immeuble is None or i in (immeuble, None)) and annee in (self.annee, None):
+                tables.update(donnees.DEPENDANCES.get(table, [table]))
+        return tables
+
+    def _prechauffer(self, immeuble):
+        # relevé avant les chargements : une écriture publiée après sera vue comme externe
+        publiees = self._publiees(immeuble)
+        modifiees = set()
+        for nom, table, charger in FRAMES:
+            df = self._etape(immeuble, nom, charger)
+            if df is None:
+                continue
+            empreinte = donnees.empreinte(df)
+            if self._empreintes.get((immeuble, nom), empreinte) != empreinte:
+                modifiees.add(table)
+            self._empreintes[(immeuble, nom)] = empreinte
+
+        # source modifiée hors de l'application (import, saisie directe en base)
+        for table in modifiees - publiees:
+            invalidation.oublier_agregats(table, self.annee, immeuble)
+
+        for nom, construire in AGREGATS:
+            self._etape(immeuble, nom, construire)
+
+    def cycle(self):
+        debut = time.perf_counter()
+        self.statut = "préchauffage" if not self.cycles else "rafraîchissement"
+
+        # chaque immeuble est indépendant : son coût ne dépend que de ses propres données
+        self.immeubles = self._immeubles()
+        for immeuble in self.immeubles:
+            self._prechauffer(immeuble)
+
+        self.cycles += 1
+        self.dernier_cycle = (time.time(), time.perf_counter() - debut)
+        self.statut = "à jour"
+
+    def run(self):
+        self.cycle()
+        while self.periode and not self._arret.wait(self.periode):
+            self.cycle()
+
+    def arreter(self):
+        self._arret.set()
+
+    # ---------- Diagnostic
+    def etat(self):
+        with self._lock:
+            etapes = pd.DataFrame(list(self.etapes.values()))
+            terminees = sum(e["statut"] != "en cours" for e in self.etapes.values())
+        if not etapes.empty:
+            etapes["le"] = pd.to_datetime(etapes["le"], unit="s")
+        return {
+            "statut": self.statut,
+            "annee": self.annee,
+            "immeubles": list(self.immeubles),
+            "cycles": self.cycles,
+            "periode": self.periode,
+            "dernier_cycle": self.dernier_cycle,
+            "etapes": etapes,
+            "progression": min(1.0, terminees / ((len(FRAMES) + len(AGREGATS)) * len(self.immeubles))),
+        }
+
+
+# =========================================================
+# INSTANCE DU PROCESS
+# =========================================================
+_instance = None
+_lock = threading.Lock()
+
+
+def demarrer(supabase, annee=ANNEE_DEFAUT, periode=PERIODE):
+    """Démarre le préchauffage une seule fois par process."""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = Prechauffage(supabase, annee, periode)
+            _instance.start()
+        return _instance
+
+
+def etat():
+    return _instance.etat() if _instance is not None else None
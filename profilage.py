@@ -0,0 +1,87 @@
+"""
+Profilage optionnel des rendus de page (cProfile).
+
+Disponible seulement si la variable d'environnement IMMEUBLE_PROFIL le permet :
+  IMMEUBLE_PROFIL=case   case « Profiler les pages » dans la barre latérale, décochée ;
+  IMMEUBLE_PROFIL=1      même case, cochée par défaut.
+Sans la variable, la case n'est pas proposée. Désactivé, le coût se limite
+à un test booléen par rendu. Seuls les IMMEUBLE_PROFILS_CONSERVES derniers
+fichiers .prof de chaque page sont gardés.
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+MODE = os.environ.get("IMMEUBLE_PROFIL", "")
+DISPONIBLE = MODE in ("1", "case")
+ACTIF_PAR_DEFAUT = MODE == "1"
+DOSSIER_PROFILS = Path(os.environ.get("IMMEUBLE_DOSSIER_PROFILS", "profils"))
+PROFILS_CONSERVES = int(os.environ.get("IMMEUBLE_PROFILS_CONSERVES", "10"))     # par page
+NB_POINTS_CHAUDS = 20
+
+derniers = {}                   # page -> {"points_chauds", "duree", "fichier", "le"}
+# un seul profileur actif à la fois dans le process
+_verrou = threading.Lock()
+
+
+def points_chauds(stats, n=NB_POINTS_CHAUDS):
+    lignes = []
+    for (fichier, ligne, fonction), (_, appels, propre, cumule, _) in stats.stats.items():
+        lignes.append({
+            "fonction": fonction,
+            "emplacement": f"{Path(fichier).name}:{ligne}",
+            "appels": appels,
+            "temps_propre_ms": propre * 1000,
+            "temps_cumule_ms": cumule * 1000,
+        })
+    return (
+        pd.DataFrame(lignes)
+        .sort_values("temps_propre_ms", ascending=False)
+        .head(n)
+        .reset_index(drop=True)
+    )
+
+
+def elaguer(page, conserves=PROFILS_CONSERVES):
+    """Supprime les profils de `page` au-delà des `conserves` plus récents."""
+    # horodatage AAAAMMJJ_HHMMSS_mmm : l'ordre des noms est l'ordre chronologique
+    fichiers = sorted(DOSSIER_PROFILS.glob(f"{page}_[0-9]*_[0-9]*_[0-9]*.prof"))
+    for fichier in fichiers[:max(len(fichiers) - conserves, 0)]:
+        fichier.unlink(missing_ok=True)
+
+
+@contextmanager
+def profiler(page, actif):
+    if not (actif and DISPONIBLE) or not _verrou.acquire(blocking=False):
+        yield None
+        return
+
+    profil = cProfile.Profile()
+    debut = time.perf_counter()
+    try:
+        profil.enable()
+        yield profil
+    finally:
+        profil.disable()
+        duree = time.perf_counter() - debut
+        _verrou.release()
+
+        DOSSIER_PROFILS.mkdir(parents=True, exist_ok=True)
+        maintenant = time.time()
+        horodatage = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(maintenant))}_{int(maintenant * 1000) % 1000:03d}"
+        fichier = DOSSIER_PROFILS / f"{page}_{horodatage}.prof"
+        profil.dump_stats(fichier)
+        elaguer(page)
+
+        derniers[page] = {
+            "points_chauds": points_chauds(pstats.Stats(profil)),
+            "duree": duree,
+            "fichier": str(fichier),
+            "le": time.time(),
+        }
@@ -0,0 +1,279 @@
+"""
+Calculs des contrôles et rapports, indépendants de Streamlit.
+Utilisés par les pages (controle_repartition_ui, budget_vs_reel_ui, statistiques_ui)
+et par le mode batch (batch.py).
+"""
+import pandas as pd
+
+TOLERANCE = 0.01      # tolérance d'arrondi en euros
+BASE_REPARTITION = 10000  # quote-part exprimée en 1 / 10 000
+COMPTES_GROUPE_4 = {"6211", "6213", "6222", "6223"}
+
+
+def groupe_compte(compte):
+    compte = str(compte)
+    if compte in COMPTES_GROUPE_4:
+        return compte[:4]
+    return compte[:3]
+
+
+# =========================================================
+# CONTRÔLE DE RÉPARTITION
+# =========================================================
+def controle_repartition(df_dep, df_rep):
+    """
+    df_dep : id, montant_ttc, compte
+    df_rep : depense_id, lot_id, quote_part (en 1 / 10 000)
+    """
+    df = df_rep.merge(
+        df_dep,
+        left_on="depense_id",
+        right_on="id",
+        how="left"
+    )
+
+    df["quote_norm"] = df["quote_part"] / BASE_REPARTITION
+    df["montant_reparti"] = df["montant_ttc"] * df["quote_norm"]
+
+    df_sum = (
+        df
+        .groupby(["depense_id", "compte"], as_index=False)
+        .agg(
+            montant_ttc=("montant_ttc", "first"),
+            montant_reparti=("montant_reparti", "sum")
+        )
+    )
+
+    df_sum["ecart"] = df_sum["montant_ttc"] - df_sum["montant_reparti"]
+
+    anomalies = df_sum[abs(df_sum["ecart"]) > TOLERANCE]
+
+    detail = df.merge(
+        anomalies[["depense_id"]],
+        on="depense_id",
+        how="inner"
+    )
+
+    total_depenses = df_sum["montant_ttc"].sum()
+    total_reparti = df_sum["montant_reparti"].sum()
+
+    return {
+        "kpi": {
+            "total_depenses": float(total_depenses),
+            "total_reparti": float(total_reparti),
+            "ecart_global": float(total_depenses - total_reparti),
+            "nb_anomalies": int(len(anomalies)),
+        },
+        "repartition": df,
+        "par_depense": df_sum,
+        "anomalies": anomalies,
+        "detail": detail,
+    }
+
+
+# =========================================================
+# BUDGET VS RÉEL
+# =========================================================
+def classer_depenses(df_dep, df_plan):
+    """
+    Ajoute groupe_compte et groupe_charges du plan comptable fourni
+    (surcharges de l'immeuble comprises) ; groupe_compte retombe sur le préfixe
+    du compte absent du plan, comme dans le cube des dépenses.
+    """
+    plan = (
+        df_plan.reindex(columns=["compte_8", "groupe_compte", "groupe_charges"])
+        .assign(compte_8=lambda d: d["compte_8"].astype(str))
+        .drop_duplicates("compte_8", keep="last")
+        .set_index("compte_8")
+    )
+    comptes = df_dep["compte"].astype(str)
+    groupes = comptes.map(plan["groupe_compte"])
+    return df_dep.assign(
+        groupe_compte=groupes.where(groupes.notna(), comptes.map(groupe_compte)),
+        groupe_charges=comptes.map(plan["groupe_charges"]),
+    )
+
+
+def budget_vs_reel(df_budget, df_dep):
+    """
+    df_budget : groupe_compte, libelle_groupe, budget
+    df_dep    : groupe_compte, montant_ttc (dépenses classées, cf. classer_depenses)
+    """
+    df_budget_grp = (
+        df_budget
+        .groupby(["groupe_compte", "libelle_groupe"], as_index=False)
+        .agg(budget=("budget", "sum"))
+    )
+
+    df_reel_grp = (
+        df_dep
+        .groupby("groupe_compte", as_index=False)
+        .agg(reel=("montant_ttc", "sum"))
+    )
+
+    df = df_budget_grp.merge(
+        df_reel_grp,
+        on="groupe_compte",
+        how="left"
+    )
+
+    df["reel"] = df["reel"].fillna(0)
+    df["ecart"] = df["budget"] - df["reel"]
+    return df
+
+
+# =========================================================
+# STATISTIQUES
+# =========================================================
+def preparer_depenses(df):
+    df = df.copy()
+    df["montant_ttc"] = df["montant_ttc"].astype(float)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["groupe_compte"] = df["compte"].astype(str).apply(groupe_compte)
+    return df
+
+
+def kpi_depenses(df):
+    total = float(df["montant_ttc"].sum())
+    nb = len(df)
+    return {"total": total, "nb": nb, "moyenne": total / nb if nb else 0}
+
+
+def par_groupe_compte(df):
+    return (
+        df.groupby("groupe_compte", as_index=False)
+        .agg(total=("montant_ttc", "sum"))
+    )
+
+
+def top_fournisseurs(df, n=10):
+    return (
+        df.groupby("fournisseur", as_index=False)
+        .agg(total=("montant_ttc", "sum"))
+        .sort_values("total", ascending=False)
+        .head(n)
+    )
+
+
+def mensuel(df):
+    """df préparé (date en datetime) ; None si aucune date exploitable."""
+    if not df["date"].notna().any():
+        return None
+
+    return (
+        df.assign(mois=df["date"].dt.to_period("M").astype(str))
+        .groupby("mois", as_index=False)
+        .agg(total=("montant_ttc", "sum"))
+    )
+
+
+def comparaison_annees(df, annees, par="groupe_compte"):
+    """
+    Pivot `par` × année (un seul groupby sur toutes les années)
+    avec écarts en valeur et en % entre années successives.
+    df : dépenses classées (cf. classer_depenses) ; une valeur de `par`
+    absente forme sa propre ligne, les totaux par année restent complets.
+    """
+    annees = sorted(annees)
+    df = df.assign(montant_ttc=pd.to_numeric(df["montant_ttc"], errors="coerce"))
+
+    pivot = (
+        df.groupby([par, "annee"], dropna=False)["montant_ttc"]
+        .sum()
+        .unstack("annee")
+        .reindex(columns=annees)
+        .fillna(0)
+    )
+    pivot.columns = [str(a) for a in annees]
+
+    for prec, cour in zip(annees, annees[1:]):
+        prec, cour = str(prec), str(cour)
+        ecart = pivot[cour] - pivot[prec]
+        pivot[f"Δ {cour}/{prec}"] = ecart
+        pivot[f"Δ% {cour}/{prec}"] = ecart / pivot[prec].where(pivot[prec] != 0) * 100
+
+    return pivot.reset_index()
+
+
+def budget_vs_reel_groupes(df_budget, df_dep):
+    """
+    Budget vs réel par groupe de compte, groupes sans budget compris.
+    df_dep : groupe_compte, montant_ttc (dépenses classées, cf. classer_depenses)
+    """
+    df_budget = df_budget.copy()
+    df_budget["budget"] = df_budget["budget"].astype(float)
+
+    df_budget = (
+        df_budget
+        .groupby("groupe_compte", as_index=False)
+        .agg(budget=("budget", "sum"))
+    )
+
+    df_dep = df_dep.copy()
+    df_dep["montant_ttc"] = df_dep["montant_ttc"].astype(float)
+
+    df_dep = (
+        df_dep
+        .groupby("groupe_compte", as_index=False)
+        .agg(reel=("montant_ttc", "sum"))
+    )
+
+    df = pd.merge(df_budget, df_dep, on="groupe_compte", how="outer").fillna(0)
+
+    df["ecart"] = df["budget"] - df["reel"]
+    df["ecart_pct"] = df.apply(
+        lambda r: (r["ecart"] / r["budget"] * 100) if r["budget"] else 0,
+        axis=1
+    )
+    return df
+
+
+# =========================================================
+# RECLASSEMENT DE COMPTES
+# =========================================================
+def impact_reclassement(par_compte, df_budget, comptes, groupe_compte=None, groupe_charges=None,
+                        surcharges=None):
+    """
+    par_compte : compte, groupe_compte, groupe_charges, total (cube de l'année)
+    Réel avant / après si `comptes` passent dans `groupe_compte` / `groupe_charges`
+    (None = inchangé) : par groupe de compte avec budget et écarts, par groupe de charges.
+    surcharges : {dimension: comptes dont l'immeuble surcharge cette valeur}, inchangés
+    par une modification du plan commun.
+    Seuls les groupes dont le réel varie sont retournés.
+    """
+    surcharges = surcharges or {}
+    apres = par_compte.copy()
+    touches = pd.Series(False, index=apres.index)
+    for dim, valeur in [("groupe_compte", groupe_compte), ("groupe_charges", groupe_charges)]:
+        if valeur is None:
+            continue
+        cible = apres["compte"].isin(comptes) & ~apres["compte"].isin(surcharges.get(dim, ()))
+        apres.loc[cible, dim] = valeur
+        touches |= cible
+
+    def comparer(dim):
+        df = pd.concat([
+            par_compte.groupby(dim, dropna=False)["total"].sum().rename("reel_avant"),
+            apres.groupby(dim, dropna=False)["total"].sum().rename("reel_apres"),
+        ], axis=1).fillna(0.0).rename_axis(dim).reset_index()
+        df["variation"] = df["reel_apres"] - df["reel_avant"]
+        return df[df["variation"].abs() > TOLERANCE].reset_index(drop=True)
+
+    par_groupe = comparer("groupe_compte")
+    budget = (
+        df_budget.assign(budget=df_budget["budget"].astype(float))
+        .groupby("groupe_compte")["budget"].sum()
+        if not df_budget.empty else pd.Series(dtype=float)
+    )
+    par_groupe.insert(1, "budget", par_groupe["groupe_compte"].map(budget).fillna(0.0))
+    par_groupe["ecart_avant"] = par_groupe["budget"] - par_groupe["reel_avant"]
+    par_groupe["ecart_apres"] = par_groupe["budget"] - par_groupe["reel_apres"]
+
+    return {
+        "kpi": {
+            "nb_comptes": int(par_compte.loc[touches, "compte"].nunique()),
+            "montant": float(par_compte.loc[touches, "total"].sum()),
+        },
+        "groupe_compte": par_groupe,
+        "groupe_charges": comparer("groupe_charges"),
+    }
@@ -0,0 +1,94 @@
+"""
+Couche de rendu : n'envoie au navigateur que des données déjà agrégées
+ou la fenêtre visible d'une grille, et mesure la charge Arrow de chaque envoi.
+"""
+import math
+
+import pyarrow as pa
+import streamlit as st
+
+TAILLE_PAGE = 50
+CLE_PAYLOAD = "payload_rendu"   # st.session_state : {cle: octets Arrow du dernier rendu}
+
+
+# =========================================================
+# MESURE
+# =========================================================
+def mesurer_payload(df):
+    """Taille en octets du flux Arrow IPC correspondant à `df` (format envoyé par Streamlit)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def _enregistrer(cle, df):
+    octets = mesurer_payload(df)
+    st.session_state.setdefault(CLE_PAYLOAD, {})[cle] = octets
+    return octets
+
+
+def payloads_session():
+    return dict(st.session_state.get(CLE_PAYLOAD, {}))
+
+
+# =========================================================
+# GRAPHIQUES (DONNÉES PRÉ-AGRÉGÉES UNIQUEMENT)
+# =========================================================
+def camembert(df, categorie, valeur, titre, cle):
+    data = df[[categorie, valeur]]
+    _enregistrer(cle, data)
+    st.vega_lite_chart(
+        data,
+        {
+            "title": titre,
+            "mark": {"type": "arc", "tooltip": True},
+            "encoding": {
+                "theta": {"field": valeur, "type": "quantitative"},
+                "color": {"field": categorie, "type": "nominal"},
+            },
+        },
+        use_container_width=True
+    )
+
+
+def barres(df, x, y, titre, cle, stack=None):
+    data = df[[x] + (y if isinstance(y, list) else [y])]
+    _enregistrer(cle, data)
+    st.markdown(f"**{titre}**")
+    st.bar_chart(data, x=x, y=y, stack=stack, use_container_width=True)
+
+
+def courbes(df, x, y, titre, cle):
+    data = df[[x] + (y if isinstance(y, list) else [y])]
+    _enregistrer(cle, data)
+    st.markdown(f"**{titre}**")
+    st.line_chart(data, x=x, y=y, use_container_width=True)
+
+
+# =========================================================
+# GRILLE PAGINÉE (SEULE LA PAGE VISIBLE EST SÉRIALISÉE)
+# =========================================================
+def grille_paginee(df, cle, taille_page=TAILLE_PAGE):
+    nb = len(df)
+    nb_pages = max(1, math.ceil(nb / taille_page))
+
+    page = st.number_input(
+        f"Page (sur {nb_pages})",
+        min_value=1,
+        max_value=nb_pages,
+        value=1,
+        step=1,
+        key=f"{cle}_page"
+    )
+
+    debut = (page - 1) * taille_page
+    fenetre = df.iloc[debut:debut + taille_page]
+    octets = _enregistrer(cle, fenetre)
+
+    st.dataframe(fenetre, use_container_width=True, hide_index=True)
+    st.caption(
+        f"Lignes {debut + 1 if nb else 0}–{min(debut + taille_page, nb)} sur {nb} "
+        f"· {octets / 1024:,.1f} Ko envoyés"
+    )
@@ -0,0 +1,137 @@
+"""
+Moteur de répartition : la table repartition_depenses est tenue en mémoire
+sous forme de matrice creuse dépenses × lots des quote-parts (normalisées à 1).
+
+Les charges par lot d'une année sont un seul produit matrice-vecteur
+Mᵀ · montants ; la ventilation par groupe de charges ou par compte est
+le même produit appliqué à une matrice creuse montants × clé.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import donnees
+from immeubles import immeuble_de
+import resilience
+from rapports import BASE_REPARTITION, TOLERANCE
+
+
+class MatriceRepartition:
+    def __init__(self, depense_ids, lots, matrice):
+        self.depense_ids = depense_ids          # Index : ligne i -> depense_id
+        self.lots = lots                        # Index : colonne j -> lot_id
+        self.matrice = matrice                  # csr (n_depenses × n_lots), quote-parts / 1
+        self._transposee = matrice.T.tocsr()
+
+    @classmethod
+    def depuis_repartition(cls, df_rep):
+        """df_rep : depense_id, lot_id, quote_part (en 1 / 10 000)"""
+        # aucune répartition : frame sans colonnes
+        df_rep = df_rep.reindex(columns=["depense_id", "lot_id", "quote_part"])
+        df_rep = df_rep.dropna(subset=["depense_id", "lot_id"])
+        lignes, depense_ids = pd.factorize(df_rep["depense_id"])
+        colonnes, lots = pd.factorize(df_rep["lot_id"], sort=True)
+
+        matrice = sparse.csr_matrix(
+            (
+                df_rep["quote_part"].astype(float).to_numpy() / BASE_REPARTITION,
+                (lignes, colonnes),
+            ),
+            shape=(len(depense_ids), len(lots)),
+        )
+        # les doublons (depense_id, lot_id) sont additionnés par la construction
+        matrice.sum_duplicates()
+        return cls(pd.Index(depense_ids), pd.Index(lots), matrice)
+
+    @property
+    def nb_depenses(self):
+        return len(self.depense_ids)
+
+    @property
+    def nb_lots(self):
+        return len(self.lots)
+
+    # ---------- Alignement
+    def _positions(self, depense_ids):
+        """Ligne de chaque dépense dans la matrice (-1 si jamais répartie)."""
+        return self.depense_ids.get_indexer(depense_ids)
+
+    def vecteur(self, montants):
+        """montants : Series indexée par depense_id -> vecteur aligné sur les lignes."""
+        pos = self._positions(montants.index)
+        connues = pos >= 0
+        v = np.zeros(self.nb_depenses)
+        np.add.at(v, pos[connues], montants.to_numpy(dtype=float)[connues])
+        return v
+
+    # ---------- Produits
+    def charges_par_lot(self, montants):
+        """Series lot_id -> montant réparti."""
+        return pd.Series(self._transposee @ self.vecteur(montants), index=self.lots)
+
+    def charges_par_lot_et(self, montants, cles):
+        """
+        DataFrame lots × valeurs de `cles` (Series alignée sur `montants`,
+        ex. groupe_charges ou compte) : Mᵀ · D, D creuse montants × clé.
+        """
+        pos = self._positions(montants.index)
+        connues = pos >= 0
+        codes, valeurs = pd.factorize(cles.fillna("—").astype(str).to_numpy(), sort=True)
+
+        d = sparse.csr_matrix(
+            (montants.to_numpy(dtype=float)[connues], (pos[connues], codes[connues])),
+            shape=(self.nb_depenses, len(valeurs)),
+        )
+        return pd.DataFrame(
+            (self._transposee @ d).toarray(),
+            index=self.lots,
+            columns=valeurs,
+        )
+
+    def taux_repartition(self, depense_ids):
+        """Somme des quote-parts de chaque dépense (1 = entièrement répartie, 0 = absente)."""
+        sommes = np.asarray(self.matrice.sum(axis=1)).ravel()
+        pos = self._positions(depense_ids)
+        return pd.Series(np.where(pos >= 0, sommes[pos], 0.0), index=depense_ids)
+
+    def non_reparti(self, montants):
+        """Part des montants non couverte par les quote-parts, par dépense (écarts > tolérance)."""
+        reste = montants * (1 - self.taux_repartition(montants.index))
+        return reste[reste.abs() > TOLERANCE]
+
+
+# =========================================================
+# MATRICES PARTAGÉES (UNE PAR IMMEUBLE, POUR TOUT LE PROCESS)
+# =========================================================
+_MATRICE = {}                   # immeuble -> MatriceRepartition
+_LOCK = threading.Lock()
+
+
+def get_matrice(supabase):
+    immeuble = immeuble_de(supabase)
+    with _LOCK:
+        matrice = _MATRICE.get(immeuble)
+    if matrice is not None:
+        return matrice
+
+    matrice = MatriceRepartition.depuis_repartition(donnees.charger_repartition(supabase))
+    # construite sur un résultat de repli : servie mais pas conservée
+    if resilience.est_perimee(("repartition_depenses", immeuble)):
+        return matrice
+    with _LOCK:
+        return _MATRICE.setdefault(immeuble, matrice)
+
+
+def oublier(immeuble=None):
+    """
+    Force la reconstruction au prochain accès (repartition_depenses modifiée) ;
+    tous les immeubles si `immeuble` est None.
+    """
+    with _LOCK:
+        if immeuble is None:
+            _MATRICE.clear()
+        else:
+            _MATRICE.pop(immeuble, None)
+            _MATRICE.pop(None, None)
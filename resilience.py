@@ -0,0 +1,235 @@
+"""
+Appels Supabase résilients : délai maximal par appel, reprises avec jitter
+pour les lectures, disjoncteur, et suivi des résultats servis en repli
+(signalés comme périmés) quand le backend est dégradé. Le repli lui-même
+est le dernier frame conservé par le magasin (cf. donnees).
+
+Seules les défaillances transitoires (délai, connexion, HTTP 5xx / 429) sont
+reprises et comptées par le disjoncteur ; une erreur déterministe (4xx PostgREST :
+table ou colonne absente, refus RLS...) remonte telle quelle à l'appelant.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+DELAI_LECTURE = float(os.environ.get("IMMEUBLE_DELAI_LECTURE", "5"))     # secondes
+DELAI_ECRITURE = float(os.environ.get("IMMEUBLE_DELAI_ECRITURE", "10"))
+REPRISES_LECTURE = 2
+ATTENTE_BASE = 0.2            # secondes, doublée à chaque reprise (jitter complet)
+SEUIL_ECHECS = 5              # échecs consécutifs avant ouverture du disjoncteur
+DUREE_OUVERTURE = 30.0        # secondes avant un essai en demi-ouverture
+
+
+class BackendIndisponible(Exception):
+    """Backend en échec et aucun résultat de repli disponible."""
+
+
+class EcritureIncertaine(BackendIndisponible):
+    """Écriture sans réponse (délai, connexion perdue, 5xx) : elle a pu être appliquée."""
+
+
+# classes SQLSTATE transitoires : connexion, sérialisation, ressources, annulation / délai
+SQLSTATE_TRANSITOIRES = ("08", "40", "53", "57")
+
+
+def transitoire(erreur):
+    """True si `erreur` tient à l'état du backend (un nouvel essai peut réussir)."""
+    if isinstance(erreur, OSError):             # TimeoutError, ConnectionError, sockets
+        return True
+
+    reponse = getattr(erreur, "response", None)  # httpx.HTTPStatusError
+    statut = getattr(reponse, "status_code", None)
+    if statut is None:
+        code = getattr(erreur, "code", None)     # postgrest APIError
+        if isinstance(code, int) or (isinstance(code, str) and code.isdigit()):
+            statut = int(code)                   # réponse non JSON (proxy, passerelle)
+        elif isinstance(code, str) and code:
+            return code.startswith(SQLSTATE_TRANSITOIRES)
+    if statut is not None:
+        return statut >= 500 or statut == 429
+
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(erreur, httpx.TransportError)
+
+
+# =========================================================
+# DISJONCTEUR
+# =========================================================
+class Disjoncteur:
+    def __init__(self, seuil=SEUIL_ECHECS, duree_ouverture=DUREE_OUVERTURE):
+        self.seuil = seuil
+        self.duree_ouverture = duree_ouverture
+        self.echecs = 0
+        self.ouvert_le = None
+        self._essai_en_cours = False
+        self._lock = threading.Lock()
+
+    @property
+    def etat(self):
+        if self.ouvert_le is None:
+            return "fermé"
+        if time.monotonic() - self.ouvert_le >= self.duree_ouverture:
+            return "demi-ouvert"
+        return "ouvert"
+
+    def autoriser(self):
+        with self._lock:
+            etat = self.etat
+            if etat == "fermé":
+                return True
+            # demi-ouvert : un seul appel d'essai à la fois
+            if etat == "demi-ouvert" and not self._essai_en_cours:
+                self._essai_en_cours = True
+                return True
+            return False
+
+    def succes(self):
+        with self._lock:
+            self.echecs = 0
+            self.ouvert_le = None
+            self._essai_en_cours = False
+
+    def neutre(self):
+        """Appel sans verdict sur le backend : libère l'essai de demi-ouverture."""
+        with self._lock:
+            self._essai_en_cours = False
+
+    def echec(self):
+        with self._lock:
+            self.echecs += 1
+            self._essai_en_cours = False
+            if self.echecs >= self.seuil or self.ouvert_le is not None:
+                self.ouvert_le = time.monotonic()
+
+
+disjoncteur = Disjoncteur()
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="supabase")
+
+_perimees = {}                  # cle -> obtenu_le, pour les clés servies depuis le repli
+_lock = threading.Lock()
+_local = threading.local()
+
+compteurs = {"appels": 0, "echecs": 0, "reprises": 0, "delais_depasses": 0, "replis": 0, "refus": 0}
+
+
+def _compter(nom):
+    with _lock:
+        compteurs[nom] += 1
+
+
+# =========================================================
+# EXÉCUTION
+# =========================================================
+def _appel(requete, delai):
+    future = _pool.submit(requete.execute)
+    try:
+        return future.result(timeout=delai)
+    except FuturesTimeout:
+        _compter("delais_depasses")
+        raise TimeoutError(f"Supabase n'a pas répondu en {delai:.1f} s")
+
+
+def servir_repli(cle, repli, erreur):
+    """
+    Lecture de `cle` en échec (`erreur`) : sert `repli` = (résultat, obtenu_le),
+    conservé par l'appelant, en le signalant comme périmé ; sans repli, `erreur` remonte.
+    """
+    if repli is None:
+        raise erreur
+    resultat, obtenu_le = repli
+
+    with _lock:
+        _perimees[cle] = obtenu_le
+        compteurs["replis"] += 1
+    perimees = getattr(_local, "perimees", None)
+    if perimees is not None:
+        perimees[cle] = obtenu_le
+    return resultat
+
+
+def fraiche(cle):
+    """`cle` relue avec succès : elle n'est plus signalée comme périmée."""
+    with _lock:
+        _perimees.pop(cle, None)
+
+
+def executer(requete, cle=None, lecture=True, delai=None):
+    """
+    Exécute `requete` (builder supabase) sous délai maximal.
+    Lecture : reprises avec jitter, puis BackendIndisponible (l'appelant sert son
+    repli via servir_repli) ; un succès retire `cle` des clés périmées.
+    Écriture : un seul essai (non idempotente) ; une défaillance transitoire
+    remonte en EcritureIncertaine (l'appel peut encore aboutir côté serveur).
+    Erreur déterministe : remontée immédiatement, sans reprise ni repli.
+    """
+    delai = delai or (DELAI_LECTURE if lecture else DELAI_ECRITURE)
+    essais = 1 + (REPRISES_LECTURE if lecture else 0)
+    erreur = None
+
+    for essai in range(essais):
+        if not disjoncteur.autoriser():
+            _compter("refus")
+            erreur = erreur or BackendIndisponible("disjoncteur ouvert")
+            break
+
+        if essai:
+            _compter("reprises")
+            time.sleep(random.uniform(0, ATTENTE_BASE * 2 ** essai))
+
+        _compter("appels")
+        try:
+            reponse = _appel(requete, delai)
+        except Exception as e:
+            _compter("echecs")
+            if not transitoire(e):
+                # erreur PostgREST : le backend a répondu, la requête est en cause
+                if getattr(e, "code", None) is not None or getattr(e, "response", None) is not None:
+                    disjoncteur.succes()
+                else:
+                    disjoncteur.neutre()
+                raise
+            disjoncteur.echec()
+            erreur = e
+            continue
+
+        disjoncteur.succes()
+        if cle is not None:
+            fraiche(cle)
+        return reponse
+
+    if isinstance(erreur, BackendIndisponible):
+        raise erreur
+    if lecture:
+        raise BackendIndisponible(str(erreur)) from erreur
+    raise EcritureIncertaine(str(erreur)) from erreur
+
+
+# =========================================================
+# SUIVI PAR RERUN (BADGE « PÉRIMÉ »)
+# =========================================================
+def debut_rerun():
+    _local.perimees = {}
+
+
+def perimees_du_rerun():
+    return dict(getattr(_local, "perimees", {}))
+
+
+def est_perimee(cle):
+    with _lock:
+        return cle in _perimees
+
+
+def etat():
+    with _lock:
+        return {
+            "disjoncteur": disjoncteur.etat,
+            "echecs_consecutifs": disjoncteur.echecs,
+            "cles_perimees": len(_perimees),
+            **compteurs,
+        }
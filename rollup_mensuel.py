@@ -0,0 +1,112 @@
+from datetime import date
+
+import pandas as pd
+
+import cube
+import donnees
+
+SEUIL_TENDANCE = 0.10  # variation relative des 3 derniers mois jugée significative
+
+
+# =========================================================
+# ROLLUP MENSUEL D'UNE ANNÉE
+# =========================================================
+class RollupMensuel:
+    """
+    Totaux mensuels d'une année, avec cumul et projection de fin d'année.
+    Vue sur les cellules « mois » du cube de l'année : aucune requête ni
+    registre propre, les écritures ne mettent à jour que le cube.
+    """
+
+    def __init__(self, annee, budget=0.0):
+        self.annee = annee
+        self.budget = float(budget or 0)
+        self.totaux = [0.0] * 12
+        self.nb = [0] * 12
+        self.cumul = [0.0] * 12
+        self.sans_date = 0.0
+
+    # ---------- Construction
+    @classmethod
+    def depuis_cube(cls, cube_annee, budget=0.0, **filtres):
+        rollup = cls(cube_annee.annee, budget)
+
+        for _, cellule in cube_annee.agreger("mois", **filtres).iterrows():
+            mois = int(cellule["mois"])
+            if mois == cube.SANS_DATE:
+                rollup.sans_date = float(cellule["total"])
+            else:
+                rollup.totaux[mois - 1] = float(cellule["total"])
+                rollup.nb[mois - 1] = int(cellule["nb"])
+
+        courant = 0.0
+        for i, total in enumerate(rollup.totaux):
+            courant += total
+            rollup.cumul[i] = courant
+        return rollup
+
+    # ---------- Lecture
+    @property
+    def total(self):
+        return self.cumul[11] + self.sans_date
+
+    def mois_ecoules(self, aujourd_hui=None):
+        aujourd_hui = aujourd_hui or date.today()
+        if self.annee < aujourd_hui.year:
+            return 12
+        if self.annee == aujourd_hui.year:
+            return aujourd_hui.month
+        # année future : on s'arrête au dernier mois saisi
+        return max((i + 1 for i, n in enumerate(self.nb) if n), default=0)
+
+    def projection(self, aujourd_hui=None):
+        ecoules = self.mois_ecoules(aujourd_hui)
+        if ecoules in (0, 12):
+            return self.total
+        return self.cumul[ecoules - 1] / ecoules * 12 + self.sans_date
+
+    def tendance(self, aujourd_hui=None):
+        """Variation relative des 3 derniers mois écoulés vs les 3 précédents."""
+        ecoules = self.mois_ecoules(aujourd_hui)
+        if ecoules < 6:
+            return None
+        recent = sum(self.totaux[ecoules - 3:ecoules])
+        precedent = sum(self.totaux[ecoules - 6:ecoules - 3])
+        if not precedent:
+            return None
+        return (recent - precedent) / abs(precedent)
+
+    def alertes(self, aujourd_hui=None):
+        alertes = []
+
+        projection = self.projection(aujourd_hui)
+        if self.budget and projection > self.budget:
+            alertes.append(
+                f"Projection fin d'année ({projection:,.2f} €) supérieure "
+                f"au budget ({self.budget:,.2f} €) de {projection - self.budget:,.2f} €"
+            )
+
+        tendance = self.tendance(aujourd_hui)
+        if tendance is not None and tendance > SEUIL_TENDANCE:
+            alertes.append(
+                f"Dépenses en hausse de {tendance:.0%} sur les 3 derniers mois"
+            )
+
+        return alertes
+
+    def serie(self):
+        return pd.DataFrame({
+            "mois": [f"{self.annee}-{m:02d}" for m in range(1, 13)],
+            "total": self.totaux,
+            "cumul": self.cumul,
+        })
+
+
+# =========================================================
+# ACCÈS
+# =========================================================
+def get_rollup(supabase, annee, **filtres):
+    """Rollup de l'année lu dans le cube (mêmes filtres que CubeDepenses.filtrer)."""
+    df_budget = donnees.charger_budgets(supabase, annee)
+    budget = float(df_budget["budget"].fillna(0).sum()) if not df_budget.empty else 0.0
+    return RollupMensuel.depuis_cube(cube.get_cube(supabase, annee), budget, **filtres)
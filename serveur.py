@@ -0,0 +1,35 @@
+"""
+Lancement du serveur avec préchauffage des caches avant la première session.
+
+    python serveur.py                       # équivaut à : streamlit run app.py
+    python serveur.py --server.port 8502    # options streamlit transmises telles quelles
+
+Le préchauffage (prechauffage.py) démarre dans le process du serveur,
+en parallèle du démarrage de Streamlit : les sessions partagent ensuite
+le magasin de frames et les agrégats déjà construits.
+"""
+import os
+import sys
+from pathlib import Path
+
+import streamlit as st
+from streamlit.web import cli as stcli
+from supabase import create_client
+
+import prechauffage
+
+APP = str(Path(__file__).parent / "app.py")
+
+
+def client():
+    # même choix de backend que app.get_supabase
+    if os.environ.get("IMMEUBLE_BACKEND") == "local":
+        import backend_local
+        return backend_local.partage()
+    return create_client(st.secrets["supabase_url"], st.secrets["supabase_anon_key"])
+
+
+if __name__ == "__main__":
+    prechauffage.demarrer(client())
+    sys.argv = ["streamlit", "run", APP, *sys.argv[1:]]
+    sys.exit(stcli.main())
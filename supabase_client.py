@@ -1,4 +1,7 @@
+import os
+
 import streamlit as st
+from dotenv import load_dotenv
 from supabase import create_client, Client
 
 
@@ -14,4 +17,12 @@ def get_supabase() -> Client:
         st.error(f"❌ Clé Supabase manquante dans st.secrets : {e}")
         st.stop()
 
-    return create_client(url, key)
\ No newline at end of file
+    return create_client(url, key)
+
+def get_supabase_env() -> Client:
+    """
+    Client Supabase hors Streamlit (scripts batch, tâches planifiées).
+    SUPABASE_URL / SUPABASE_KEY sont lus dans l'environnement ou un fichier .env
+    """
+    load_dotenv()
+    return create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
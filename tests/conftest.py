@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import donnees  # noqa: E402
+import resilience  # noqa: E402
+from frames_store import magasin  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def etat_vierge():
+    """Magasin, tranches, clés périmées et disjoncteur remis à zéro autour de chaque test."""
+    def remettre():
+        magasin.vider()
+        donnees._tranches.clear()
+        resilience._perimees.clear()
+        resilience.disjoncteur.succes()
+
+    remettre()
+    yield
+    remettre()
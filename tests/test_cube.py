@@ -0,0 +1,82 @@
+import pandas as pd
+
+from cube import CubeDepenses, DIMENSIONS
+
+PLAN = {
+    "60100000": ("601", 1),
+    "60200000": ("602", 2),
+    "61500000": ("615", 3),
+}
+
+
+def depenses():
+    return pd.DataFrame([
+        {"depense_id": 1, "date": "2024-01-15", "compte": "60100000", "fournisseur": "EDF", "type": "facture", "montant_ttc": 120.0},
+        {"depense_id": 2, "date": "2024-01-20", "compte": "60100000", "fournisseur": "EDF", "type": "facture", "montant_ttc": 80.0},
+        {"depense_id": 3, "date": "2024-02-03", "compte": "60200000", "fournisseur": "Veolia", "type": "facture", "montant_ttc": 45.5},
+        {"depense_id": 4, "date": None, "compte": "61500000", "fournisseur": None, "type": "avoir", "montant_ttc": -30.0},
+        {"depense_id": 5, "date": "2024-03-10", "compte": "61500000", "fournisseur": "Otis", "type": "facture", "montant_ttc": 300.0},
+    ])
+
+
+def cellules(cube):
+    df = cube.frame()
+    return (
+        df.astype({d: str for d in DIMENSIONS})
+        .sort_values(DIMENSIONS, ignore_index=True)
+    )
+
+
+def assert_cubes_egaux(cube, attendu):
+    pd.testing.assert_frame_equal(cellules(cube), cellules(attendu), check_dtype=False)
+
+
+def test_deltas_equivalent_a_une_reconstruction():
+    df = depenses()
+    cube = CubeDepenses.depuis_depenses(2024, df, dict(PLAN))
+
+    insertion = {"depense_id": 6, "date": "2024-02-28", "compte": "60200000", "fournisseur": "Veolia", "type": "facture", "montant_ttc": 54.5}
+    cube.appliquer(nouvelle=insertion)
+    # mise à jour partielle : les champs absents sont repris de l'ancienne version
+    cube.appliquer(ancienne={"depense_id": 1}, nouvelle={"depense_id": 1, "compte": "61500000", "montant_ttc": 150.0})
+    cube.appliquer(ancienne=df[df["depense_id"] == 2].iloc[0].to_dict())
+
+    final = df[df["depense_id"] != 2].copy()
+    final.loc[final["depense_id"] == 1, ["compte", "montant_ttc"]] = ["61500000", 150.0]
+    final = pd.concat([final, pd.DataFrame([insertion])], ignore_index=True)
+
+    assert_cubes_egaux(cube, CubeDepenses.depuis_depenses(2024, final, dict(PLAN)))
+
+
+def test_suppression_de_la_derniere_ligne_retire_la_cellule():
+    df = depenses()
+    cube = CubeDepenses.depuis_depenses(2024, df, dict(PLAN))
+
+    cube.appliquer(ancienne={"depense_id": 3})
+
+    assert not (cube.frame()["compte"] == "60200000").any()
+    assert_cubes_egaux(cube, CubeDepenses.depuis_depenses(2024, df[df["depense_id"] != 3], dict(PLAN)))
+
+
+def test_reclasser_equivalent_a_une_reconstruction():
+    df = depenses()
+    cube = CubeDepenses.depuis_depenses(2024, df, dict(PLAN))
+
+    # 60100000 rejoint le groupe de charges de 60200000 : deux cellules fusionnent
+    deplacees = cube.reclasser({"60100000": ("602", 2)})
+
+    assert deplacees == 1
+    assert_cubes_egaux(cube, CubeDepenses.depuis_depenses(2024, df, {**PLAN, "60100000": ("602", 2)}))
+
+
+def test_deltas_apres_reclassement():
+    df = depenses()
+    cube = CubeDepenses.depuis_depenses(2024, df, dict(PLAN))
+    plan = {**PLAN, "61500000": ("615", 4)}
+
+    cube.reclasser({"61500000": ("615", 4)})
+    cube.appliquer(ancienne={"depense_id": 5}, nouvelle={"depense_id": 5, "montant_ttc": 250.0})
+
+    final = df.copy()
+    final.loc[final["depense_id"] == 5, "montant_ttc"] = 250.0
+    assert_cubes_egaux(cube, CubeDepenses.depuis_depenses(2024, final, plan))
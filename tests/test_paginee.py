@@ -0,0 +1,69 @@
+import time
+
+import pandas as pd
+import pytest
+
+import donnees
+import resilience
+from frames_store import magasin
+
+
+class RequeteLente:
+    """Builder minimal : `lignes` servies par .range(), chaque execute() dure `duree(debut)` secondes."""
+
+    def __init__(self, lignes, duree):
+        self.lignes = lignes
+        self.duree = duree
+        self.plage = None
+        self.appels = 0
+
+    def range(self, debut, fin):
+        self.plage = (debut, fin)
+        return self
+
+    def execute(self):
+        self.appels += 1
+        debut, fin = self.plage
+        time.sleep(self.duree(debut))
+        return donnees._Reponse(self.lignes[debut:fin + 1])
+
+
+@pytest.fixture(autouse=True)
+def delais_courts(monkeypatch):
+    monkeypatch.setattr(resilience, "DELAI_LECTURE", 0.2)
+    monkeypatch.setattr(resilience, "ATTENTE_BASE", 0)
+
+
+def test_chaque_page_a_son_propre_delai():
+    lignes = [{"depense_id": i} for i in range(10)]
+    requete = RequeteLente(lignes, lambda debut: 0.1)
+
+    debut = time.monotonic()
+    df = donnees._lire(("depenses", 1), donnees.Paginee(lambda: requete, taille=2))
+
+    # 6 pages de 0,1 s : bien au-delà du délai d'un appel, chacune en deçà
+    assert time.monotonic() - debut > resilience.DELAI_LECTURE
+    assert requete.appels == 6
+    assert df["depense_id"].tolist() == list(range(10))
+    assert not resilience.est_perimee(("depenses", 1))
+
+
+def test_page_hors_delai_sert_le_repli_du_magasin():
+    cle = ("depenses", 1)
+    magasin.deposer(cle, pd.DataFrame({"depense_id": [1, 2]}))
+    magasin.invalider(lambda c: c == cle)
+
+    lignes = [{"depense_id": i} for i in range(10)]
+    requete = RequeteLente(lignes, lambda debut: 0.5 if debut >= 4 else 0)
+
+    df = donnees._lire(cle, donnees.Paginee(lambda: requete, taille=2))
+
+    assert df["depense_id"].tolist() == [1, 2]
+    assert resilience.est_perimee(cle)
+
+
+def test_page_hors_delai_sans_repli():
+    requete = RequeteLente([{"depense_id": i} for i in range(4)], lambda debut: 0.5)
+
+    with pytest.raises(resilience.BackendIndisponible):
+        donnees._lire(("depenses", 1), donnees.Paginee(lambda: requete, taille=2))
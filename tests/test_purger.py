@@ -0,0 +1,73 @@
+import pandas as pd
+
+import donnees
+from frames_store import magasin
+
+FRAME = pd.DataFrame({"annee": [2024], "montant_ttc": [1.0]})
+
+
+def deposer(*cles):
+    for cle in cles:
+        magasin.deposer(cle, FRAME)
+
+
+def test_ecriture_datee_ne_purge_que_son_annee():
+    deposer(
+        ("depenses", 1, 2024), ("depenses", 1, 2023),
+        ("depenses", None, 2024), ("depenses", 2, 2024),
+        ("v_depenses_detail", 1, 2024), ("v_depenses_detail", 1, 2023),
+    )
+
+    donnees.purger("depenses", 2024, 1)
+
+    assert not magasin.contient(("depenses", 1, 2024))
+    assert not magasin.contient(("depenses", None, 2024))
+    assert not magasin.contient(("v_depenses_detail", 1, 2024))
+    assert magasin.contient(("depenses", 1, 2023))
+    assert magasin.contient(("depenses", 2, 2024))
+    assert magasin.contient(("v_depenses_detail", 1, 2023))
+
+
+def test_ecriture_datee_marque_la_tranche_du_frame_toutes_annees():
+    deposer(("depenses", 1), ("depenses", None), ("depenses", 2))
+
+    donnees.purger("depenses", 2024, 1)
+
+    # frames toutes années gardés : seule la tranche 2024 sera relue
+    assert magasin.contient(("depenses", 1))
+    assert magasin.contient(("depenses", None))
+    assert donnees._tranches == {("depenses", 1): {2024}, ("depenses", None): {2024}}
+
+
+def test_ecriture_datee_purge_les_frames_sans_annee_des_autres_tables():
+    deposer(("plan_comptable", 1), ("plan_comptable", 2), ("plan_comptable_immeuble", 1), ("budgets", 1, 2024))
+
+    donnees.purger("plan_comptable_immeuble", 2024, 1)
+
+    assert not magasin.contient(("plan_comptable_immeuble", 1))
+    assert not magasin.contient(("plan_comptable", 1))
+    assert magasin.contient(("plan_comptable", 2))
+    assert magasin.contient(("budgets", 1, 2024))
+
+
+def test_purge_sans_annee_ni_immeuble():
+    deposer(("depenses", 1, 2024), ("depenses", 2, 2023), ("depenses", 1), ("budgets", 1, 2024))
+    donnees._tranches[("depenses", 1)] = {2023}
+
+    donnees.purger("depenses")
+
+    assert not magasin.contient(("depenses", 1, 2024))
+    assert not magasin.contient(("depenses", 2, 2023))
+    assert not magasin.contient(("depenses", 1))
+    assert magasin.contient(("budgets", 1, 2024))
+    assert donnees._tranches == {}
+
+
+def test_purge_garde_le_repli():
+    deposer(("depenses", 1, 2024))
+
+    donnees.purger("depenses", 2024, 1)
+
+    assert magasin.lire(("depenses", 1, 2024)) is None
+    df, _ = magasin.repli(("depenses", 1, 2024))
+    assert len(df) == 1